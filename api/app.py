@@ -1,23 +1,49 @@
 from flask import Flask, jsonify
 from database import init_app, db
+import compression
+import metrics
+import slow_queries
+import spatial_index
 from routes.locations import locations_bp
 from routes.movies import movies_bp
 from routes.filming_locations import filming_locations_bp
 from routes.restaurants import restaurants_bp
 from routes.itinaries import itineraries_bp
+from routes.stats import stats_bp
+from routes.batch import batch_bp
+from routes.tiles import tiles_bp
+from routes.clusters import clusters_bp
+from serializers import FastJSONProvider
 import json
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Initialize database
 init_app(app)
 
+# Time requests and SQL statements (exposed at /api/v1/metrics)
+metrics.init_app(app)
+
+# Log slow statements with their plans
+slow_queries.init_app(app)
+
+# Compress the responses (registered last so that its hook runs first, and the metrics see the compressed sizes)
+compression.init_app(app)
+
+# Load the in-process spatial engine when NEARBY_ENGINE=memory
+spatial_index.init_app(app)
+
 # Register blueprints
 app.register_blueprint(movies_bp, url_prefix="/api/v1")
 app.register_blueprint(locations_bp, url_prefix="/api/v1")
 app.register_blueprint(filming_locations_bp, url_prefix="/api/v1")
 app.register_blueprint(restaurants_bp, url_prefix="/api/v1")
 app.register_blueprint(itineraries_bp, url_prefix="/api/v1")
+app.register_blueprint(stats_bp, url_prefix="/api/v1")
+app.register_blueprint(batch_bp, url_prefix="/api/v1")
+app.register_blueprint(tiles_bp, url_prefix="/api/v1")
+app.register_blueprint(clusters_bp, url_prefix="/api/v1")
 
 # Load metadata from JSON file
 METADATA_FILE = 'api_metadata.json'
@@ -0,0 +1,157 @@
+"""
+Asynchronous variant of the read API.
+
+Serves the same /api/v1 routes as app.py with Quart over an asyncpg connection pool. The
+models, query builders, SQL and serializers of the Flask routes are reused, only the database
+calls are awaited, so a single process can keep many slow spatial queries in flight.
+
+Run it with an ASGI server, for example:
+    hypercorn async_app:app --bind 0.0.0.0:5001
+"""
+import json
+import os
+from quart import Blueprint, Quart, Response, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import DATABASE_URI, engine_options_from_env
+from models import FilmingLocation, Location, Movie
+from pagination import apply_keyset, next_page_url, parse_page_args, split_page
+from routes.filming_locations import apply_filming_location_filters, filming_location_sort_columns
+from routes.itinaries import group_itineraries, itinerary_query
+from routes.locations import apply_location_filters, location_columns
+from routes.movies import apply_movie_filters, movie_fields_options
+from routes.restaurants import nearby_restaurants_query, parse_nearby_restaurants_args
+from serializers import FastJSONProvider, dump_filming_location, dump_location, dump_restaurant_row
+from walking_tour import order_itineraries_route
+
+# Same database as the Flask API, reached through the asyncpg driver
+ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URL", DATABASE_URI.replace("+psycopg2", "+asyncpg"))
+
+engine = create_async_engine(ASYNC_DATABASE_URI, **engine_options_from_env(asyncio=True))
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+async_api_bp = Blueprint("async_api", __name__)
+
+
+async def fetch_page(session, statement, sort_columns, scalars=True):
+    """
+    Execute one keyset page of a select() statement.
+
+    Returns:
+        tuple: (items, next_cursor), items being entities when scalars is True, rows otherwise.
+    """
+    limit, cursor = parse_page_args(request.args)
+    statement = apply_keyset(statement, sort_columns, cursor).limit(limit + 1)
+    result = await session.execute(statement)
+    items = result.scalars().all() if scalars else result.all()
+    return split_page(items, sort_columns, limit)
+
+
+def page_response(data, next_cursor):
+    """
+    Build a JSON response with a 'Link: <...>; rel="next"' header when another page exists.
+    """
+    response = jsonify(data)
+    if next_cursor:
+        response.headers["Link"] = f'<{next_page_url(request.base_url, request.args, next_cursor)}>; rel="next"'
+    return response
+
+
+@async_api_bp.route("/movies", methods=["GET"])
+async def get_movies():
+    try:
+        options, dump = movie_fields_options(request.args.get("fields"))
+        statement = apply_movie_filters(select(Movie).options(*options), request.args)
+        async with async_session() as session:
+            movies, next_cursor = await fetch_page(session, statement, [Movie.mov_imdb_id])
+            data = [dump(movie) for movie in movies]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return page_response(data, next_cursor)
+
+
+@async_api_bp.route("/locations", methods=["GET"])
+async def get_locations():
+    try:
+        statement = apply_location_filters(select(*location_columns), request.args)
+        async with async_session() as session:
+            locations, next_cursor = await fetch_page(session, statement, [Location.loc_id], scalars=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return page_response([dump_location(location) for location in locations], next_cursor)
+
+
+@async_api_bp.route("/filming-locations", methods=["GET"])
+async def get_filming_locations():
+    try:
+        statement = apply_filming_location_filters(select(FilmingLocation), request.args)
+        async with async_session() as session:
+            filming_locations, next_cursor = await fetch_page(session, statement, filming_location_sort_columns)
+            data = [dump_filming_location(filming_location) for filming_location in filming_locations]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return page_response(data, next_cursor)
+
+
+@async_api_bp.route("/restaurants", methods=["GET"])
+async def get_restaurants():
+    try:
+        sql_query, params = nearby_restaurants_query(*parse_nearby_restaurants_args(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with async_session() as session:
+        result = await session.execute(sql_query, params)
+        return jsonify([dump_restaurant_row(row) for row in result.mappings()])
+
+
+@async_api_bp.route("/itineraries", methods=["GET"])
+async def get_itineraries():
+    try:
+        sql_query, params, aggregation, order = itinerary_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with async_session() as session:
+        result = await session.execute(sql_query, params)
+        if aggregation == "sql":
+            # Postgres returns each itinerary as JSON text, which is sent without being decoded
+            return Response("[" + ",".join(result.scalars()) + "]", mimetype="application/json")
+        itineraries = group_itineraries(result.mappings())
+        if order == "route":
+            itineraries = order_itineraries_route(itineraries)
+        return jsonify(list(itineraries))
+
+
+@async_api_bp.route("/metadata", methods=["GET"])
+async def get_metadata():
+    """
+    Endpoint to retrieve API metadata.
+    """
+    return jsonify(api_metadata), 200
+
+
+# Load metadata from JSON file
+METADATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_metadata.json")
+
+try:
+    with open(METADATA_FILE, 'r', encoding='utf-8') as file:
+        api_metadata = json.load(file)
+except FileNotFoundError:
+    api_metadata = {"error": "Metadata file not found. Please ensure 'api_metadata.json' exists."}
+
+app = Quart(__name__)
+app.json = FastJSONProvider(app)
+app.register_blueprint(async_api_bp, url_prefix="/api/v1")
+
+
+@app.after_serving
+async def dispose_engine():
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5001)
@@ -0,0 +1,64 @@
+"""
+Bounding-box filter (bbox=west,south,east,north in degrees) of the location endpoints.
+"""
+import math
+from geoalchemy2 import Geography
+from sqlalchemy import and_, cast, func
+from models import Location
+
+# Above this width, the box is not matched with the spatial index: geography edges longer
+# than half the globe are ambiguous, and such a box selects most of the table anyway
+BBOX_INDEX_MAX_WIDTH = 180.0
+
+
+def parse_bbox(value):
+    """
+    Parse a 'west,south,east,north' bounding box in degrees (WGS 84).
+
+    Returns:
+        tuple: (west, south, east, north)
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("The 'bbox' parameter must be 'west,south,east,north' in degrees.")
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("The 'bbox' parameter must satisfy -180 <= west <= east <= 180 and -90 <= south <= north <= 90.")
+    return west, south, east, north
+
+
+def geography_envelope_bounds(bbox):
+    """
+    Bounds of a geography envelope enclosing a bounding box, or None if the box is too wide.
+
+    The edges of a geography envelope are geodesics, which bend towards the pole: an edge at
+    latitude phi reaches atan(k * tan(phi)) in its middle, k being 1 / cos(width / 2). The
+    envelope is widened by the largest bend, atan(sqrt(k)) - atan(1 / sqrt(k)), reached where
+    tan(phi) = 1 / sqrt(k).
+    """
+    west, south, east, north = bbox
+    if east - west >= BBOX_INDEX_MAX_WIDTH:
+        return None
+    k = 1 / math.cos(math.radians(east - west) / 2)
+    margin = math.degrees(math.atan(math.sqrt(k)) - math.atan(1 / math.sqrt(k)))
+    return west, max(south - margin, -90.0), east, min(north + margin, 90.0)
+
+
+def bbox_condition(bbox, location=Location):
+    """
+    Condition selecting the locations inside a bounding box.
+
+    The && operator finds the candidates with the GiST index on loc_geography, and the
+    latitude/longitude comparison keeps the ones actually inside.
+    """
+    west, south, east, north = bbox
+    inside = and_(
+        location.loc_latitude.between(south, north),
+        location.loc_longitude.between(west, east),
+    )
+    envelope_bounds = geography_envelope_bounds(bbox)
+    if envelope_bounds is None:
+        return inside
+
+    envelope = cast(func.ST_MakeEnvelope(*envelope_bounds, 4326), Geography(srid=4326))
+    return and_(location.loc_geography.op("&&")(envelope), inside)
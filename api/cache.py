@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from compression import compress, is_compressible, negotiate_encoding, set_encoded_body
+from dataset_version import get_dataset_version
+from slow_queries import explain_requested
+from streaming import wants_stream
+
+# Cache configuration
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory", "redis" or "none"
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))  # In seconds
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Response headers kept alongside a cached body
+CACHED_HEADERS = ("Content-Type", "Link")
+
+
+class LRUCache:
+    """
+    In-process least recently used cache with a time to live and a bounded number of entries.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """
+    Cache shared between API processes, stored in Redis (requires the optional 'redis' package).
+    """
+
+    def __init__(self, url, ttl, prefix="food-and-the-city:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package to be installed.")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(self.ttl))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+def create_cache(backend=CACHE_BACKEND):
+    """
+    Build the cache backend selected by the CACHE_BACKEND environment variable.
+    """
+    if backend == "none":
+        return None
+    if backend == "redis":
+        return RedisCache(CACHE_REDIS_URL, CACHE_TTL)
+    if backend == "memory":
+        return LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'.")
+
+
+response_cache = create_cache()
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _count(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_cache_stats():
+    """
+    Return the hit/miss counters of this process and the size of the cache.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["backend"] = CACHE_BACKEND
+    stats["entries"] = len(response_cache) if response_cache is not None else 0
+    stats["dataset_version"] = get_dataset_version()
+    return stats
+
+
+def request_cache_key():
+    """
+    Build the cache key of the current request: route, path parameters, dataset version and
+    the query parameters sorted by name so that their order does not matter.
+    """
+    args = sorted((name, value.strip()) for name, values in request.args.lists() for value in values)
+    view_args = sorted((request.view_args or {}).items())
+    key = json.dumps([request.endpoint, view_args, get_dataset_version(), args], separators=(",", ":"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def encode_cached_response(key, entry):
+    """
+    Build the response of a cache entry, compressed with the encoding negotiated with the client.
+    Each encoding of the body is computed once and added to the entry, so that it is reused until
+    the entry expires or the dataset version changes.
+    """
+    body, status, headers, encoded_bodies = entry
+    response = current_app.response_class(body, status=status, headers=headers)
+    if not is_compressible(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(len(body))
+    if encoding is None:
+        return response
+    if encoding not in encoded_bodies:
+        encoded_bodies[encoding] = compress(body, encoding)
+        response_cache.set(key, (body, status, headers, encoded_bodies))
+    return set_encoded_body(response, encoding, encoded_bodies[encoding])
+
+
+def cached(view):
+    """
+    Cache successful responses of a read endpoint until the TTL expires or the
+    ingestion pipeline publishes a new dataset version, with their compressed bodies.
+    Streamed responses and requests asking for their query plans are never cached.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if response_cache is None or wants_stream() or explain_requested():
+            return view(*args, **kwargs)
+
+        key = request_cache_key()
+        entry = response_cache.get(key)
+        if entry is not None:
+            _count("hits")
+            return encode_cached_response(key, entry)
+
+        _count("misses")
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+            entry = (response.get_data(), response.status_code, headers, {})
+            response_cache.set(key, entry)
+            return encode_cached_response(key, entry)
+        return response
+
+    return wrapper
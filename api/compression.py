@@ -0,0 +1,110 @@
+"""
+Compression of the API responses (gzip, and brotli when the optional 'brotli' package is installed).
+
+The encoding is negotiated with the Accept-Encoding header of the request, in the server's order
+of preference. Responses smaller than COMPRESSION_MIN_SIZE, streamed responses and responses
+of other content types are sent as is. Cached responses are compressed by the cache itself,
+which keeps the compressed bodies alongside the original one (see cache.cached).
+"""
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, only needed for the "br" encoding
+    brotli = None
+
+# Encodings offered to clients, in order of preference ("none" disables compression)
+COMPRESSION_ALGORITHMS = [
+    algorithm.strip()
+    for algorithm in os.getenv("COMPRESSION_ALGORITHMS", "br,gzip" if brotli is not None else "gzip").split(",")
+    if algorithm.strip() not in ("", "none")
+]
+# Smallest body compressed, in bytes (smaller bodies gain less than the overhead)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.mapbox-vector-tile",
+    "text/plain",
+    "text/html",
+)
+
+
+def compress(data, encoding):
+    """
+    Compress a body with the given content encoding ("gzip" or "br").
+    """
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    raise ValueError(f"Unknown content encoding '{encoding}'.")
+
+
+def is_compressible(response):
+    """
+    Whether a response may be compressed, whatever the size of its body.
+    """
+    return (
+        response.status_code not in (204, 304)
+        and response.status_code >= 200
+        and not response.is_streamed
+        and not response.direct_passthrough
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def negotiate_encoding(size):
+    """
+    Return the preferred encoding accepted by the client for a body of size bytes, or None
+    to send it as is.
+    """
+    if size < COMPRESSION_MIN_SIZE:
+        return None
+    for encoding in COMPRESSION_ALGORITHMS:
+        if request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def set_encoded_body(response, encoding, body):
+    """
+    Replace the body of a response by its encoded version.
+    """
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _compress_response(response):
+    """
+    Compress the responses that were not compressed by the cache.
+    """
+    if not is_compressible(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = negotiate_encoding(len(body))
+    if encoding is None:
+        return response
+    return set_encoded_body(response, encoding, compress(body, encoding))
+
+
+def init_app(app):
+    """
+    Check the configured encodings and compress the responses of the application.
+    """
+    for encoding in COMPRESSION_ALGORITHMS:
+        if encoding == "br" and brotli is None:
+            raise RuntimeError("COMPRESSION_ALGORITHMS=br requires the 'brotli' package to be installed.")
+        if encoding not in ("br", "gzip"):
+            raise RuntimeError(f"Unknown encoding '{encoding}' in COMPRESSION_ALGORITHMS.")
+    app.after_request(_compress_response)
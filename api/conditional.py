@@ -0,0 +1,43 @@
+from functools import wraps
+from flask import current_app, request
+from cache import request_cache_key
+from dataset_version import get_dataset_version
+from streaming import wants_stream
+
+
+def request_etag():
+    """
+    Compute the ETag of the current request from the dataset version and the normalized
+    request (route, query parameters and response format). Returns None when the dataset
+    version is unknown, since the response could then change without notice.
+    """
+    if get_dataset_version() is None:
+        return None
+    return request_cache_key() + ("-ndjson" if wants_stream() else "")
+
+
+def etag(view):
+    """
+    Answer 'If-None-Match' requests with 304 Not Modified when the client already holds the
+    response for the current dataset version, without running the view.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        tag = request_etag()
+        if tag is None:
+            return view(*args, **kwargs)
+
+        if request.if_none_match.contains_weak(tag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # Weak validator: the body may be re-encoded (e.g. compressed) for the same tag
+        response.set_etag(tag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Accept")
+        return response
+
+    return wrapper
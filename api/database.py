@@ -1,5 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 import os
+import threading
+import time
 
 db = SQLAlchemy()
 
@@ -9,7 +13,113 @@ db = SQLAlchemy()
 DATABASE_URI = os.getenv("DATABASE_URL", "postgresql+psycopg2://root:root@db:5432/food-and-the-city")
 
 
+class PoolStats:
+    """
+    Process-wide counters of connection checkouts: how many, how long they waited, how many timed out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait_seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedPoolMixin:
+    """
+    Measure the time spent waiting for a connection (queue wait plus connection setup) on each checkout.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(TimedPoolMixin, NullPool):
+    pass
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def engine_options_from_env(asyncio=False):
+    """
+    Build the SQLAlchemy engine options from the DB_* environment variables.
+    With asyncio=True the options target an asyncio engine (see async_app.py).
+
+    DB_PGBOUNCER=true is meant for deployments behind PgBouncer: PgBouncer already pools the
+    server connections, so the API opens one per checkout and keeps none idle.
+    """
+    options = {"pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true")}
+    if _env_flag("DB_PGBOUNCER", "false"):
+        options["poolclass"] = NullPool if asyncio else TimedNullPool
+        if asyncio:
+            # Prepared statements do not survive PgBouncer transaction pooling
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options.update({
+        "poolclass": AsyncAdaptedQueuePool if asyncio else TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),  # Seconds to wait for a free connection
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # Seconds before a connection is replaced
+    })
+    return options
+
+
+def get_pool_stats():
+    """
+    Return the current state of the connection pool and the checkout counters of this process.
+    """
+    pool = db.engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),  # Negative while the pool is below pool_size
+        })
+    stats.update(pool_stats.as_dict())
+    return stats
+
+
 def init_app(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env()
     db.init_app(app)
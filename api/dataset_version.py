@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import DatasetVersion
+
+logger = logging.getLogger(__name__)
+
+# Number of seconds during which the last known dataset version is trusted without asking the database
+VERSION_CHECK_INTERVAL = float(os.getenv("DATASET_VERSION_CHECK_INTERVAL", "5"))
+
+_lock = threading.Lock()
+_state = {"row": None, "checked_at": None}
+
+
+def _load_dataset_version_row():
+    """
+    Read the dataset version row written by the ingestion pipeline.
+    Uses its own connection so that a failure never affects the request session.
+    """
+    try:
+        with db.engine.connect() as connection:
+            return connection.execute(select(DatasetVersion).where(DatasetVersion.dv_id == 1)).mappings().first()
+    except SQLAlchemyError as e:
+        logger.warning("Could not read the dataset version: %s", e)
+        return None
+
+
+def get_dataset_version_row():
+    """
+    Return the fc_dataset_version row as a mapping (or None if unavailable), re-reading it
+    from the database at most once every VERSION_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    with _lock:
+        if _state["checked_at"] is not None and now - _state["checked_at"] < VERSION_CHECK_INTERVAL:
+            return _state["row"]
+
+    row = _load_dataset_version_row()
+    with _lock:
+        _state["row"] = row
+        _state["checked_at"] = now
+    return row
+
+
+def get_dataset_version():
+    """
+    Return the current dataset version number, or None if it cannot be determined.
+    """
+    row = get_dataset_version_row()
+    return row["dv_version"] if row else None
+
+
+def get_proximity_radius():
+    """
+    Return the radius in meters covered by the precomputed filming location to restaurant
+    proximity table, or None if the table has not been built.
+    """
+    row = get_dataset_version_row()
+    return row["dv_proximity_radius"] if row else None
+
+
+def get_cluster_max_zoom():
+    """
+    Return the deepest zoom level of the precomputed location clusters, or None if they have not been built.
+    """
+    row = get_dataset_version_row()
+    return row["dv_cluster_max_zoom"] if row else None
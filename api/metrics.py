@@ -0,0 +1,171 @@
+"""
+Request and SQL instrumentation exposed in the Prometheus text format.
+
+Every request records its latency, the size of its response and the time its SQL statements
+took, labelled by route; every statement records its own latency and row count, labelled by
+route and statement type. The difference between the request latency and its SQL time is the
+time spent in Python (filtering, regrouping, serialization).
+"""
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Cumulative histogram with one series per combination of label values.
+    """
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = format_labels(zip(self.label_names, label_values))
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{format_value(bound)}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{{{labels}}} {series['count']}")
+        return lines
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def format_gauges(name, documentation, kind, values):
+    """
+    Format one gauge or counter per key of values, the key becoming the value of the 'name' label.
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for key, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name}{{{format_labels([("name", key)])}}} {format_value(value)}')
+    return lines
+
+
+request_latency = Histogram(
+    "api_request_duration_seconds", "Time spent handling a request.",
+    ("route", "method", "status"), LATENCY_BUCKETS,
+)
+request_sql_latency = Histogram(
+    "api_request_sql_duration_seconds", "Time spent executing SQL statements during a request.",
+    ("route",), LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "api_response_size_bytes", "Size of the response bodies (streamed responses are not counted).",
+    ("route",), BYTES_BUCKETS,
+)
+sql_latency = Histogram(
+    "api_sql_statement_duration_seconds", "Time spent executing one SQL statement.",
+    ("route", "statement"), LATENCY_BUCKETS,
+)
+sql_rows = Histogram(
+    "api_sql_statement_rows", "Number of rows returned or affected by one SQL statement.",
+    ("route", "statement"), ROWS_BUCKETS,
+)
+
+
+def _current_route():
+    """
+    Label of the route being served, 'none' outside of a request (e.g. pipeline or startup queries).
+    """
+    if has_request_context():
+        return request.endpoint or "unmatched"
+    return "none"
+
+
+def _statement_type(statement):
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is dropped with the statement even when it fails
+    context._metrics_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start_time
+    route = _current_route()
+    statement_type = _statement_type(statement)
+    sql_latency.observe(elapsed, route, statement_type)
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        sql_rows.observe(cursor.rowcount, route, statement_type)
+    if has_request_context():
+        g.sql_seconds = g.get("sql_seconds", 0.0) + elapsed
+
+
+def _before_request():
+    g.request_start_time = time.perf_counter()
+    g.sql_seconds = 0.0
+
+
+def _after_request(response):
+    start = g.pop("request_start_time", None)
+    if start is None:
+        return response
+
+    route = request.endpoint or "unmatched"
+    # Time until the response is returned; the body of a streamed response is produced later
+    request_latency.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    request_sql_latency.observe(g.get("sql_seconds", 0.0), route)
+    if not response.is_streamed and response.content_length is not None:
+        response_size.observe(response.content_length, route)
+    return response
+
+
+def init_app(app):
+    """
+    Time every request of the application.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def render_metrics(extra_lines=()):
+    """
+    Return all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for histogram in (request_latency, request_sql_latency, response_size, sql_latency, sql_rows):
+        lines.extend(histogram.expose())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, ForeignKey, Integer, String, Float, Text
+from sqlalchemy import Table, Column, DateTime, ForeignKey, Index, Integer, String, Float, Text
 from sqlalchemy.orm import relationship
 from database import db
 from geoalchemy2 import Geography
@@ -19,8 +19,23 @@ fc_actors_movies = Table(
     Column("am_imdb_id", ForeignKey("fc_movies.mov_imdb_id"), primary_key=True)
 )
 
+def trigram_index(table_name, column_name):
+    """
+    GIN trigram index (pg_trgm) able to serve leading-wildcard ILIKE filters on a column.
+    """
+    return Index(
+        f"idx_{table_name}_{column_name}_trgm",
+        column_name,
+        postgresql_using="gin",
+        postgresql_ops={column_name: "gin_trgm_ops"}
+    )
+
 class Location(db.Model):
     __tablename__ = "fc_locations"
+    __table_args__ = (
+        trigram_index("fc_locations", "loc_city"),
+        trigram_index("fc_locations", "loc_suburb"),
+    )
 
     loc_id = Column(Integer, primary_key=True)
     loc_source_type = Column(String(255))
@@ -53,13 +68,17 @@ class Restaurant(db.Model):
     res_doing_business_as_dba = Column(String(255))
     res_seating_interest_sidewalk = Column(String(15))  # Allowed values: 'sidewalk', 'both', 'openstreets', 'roadway'
     res_landmarkdistrict_terms = Column(Integer)  # Boolean values (1/0)
-    res_location_id = Column(Integer, ForeignKey("fc_locations.loc_id"))
+    res_location_id = Column(Integer, ForeignKey("fc_locations.loc_id"), index=True)
     loc_geography = Column(Geography("POINT"))  # For geospatial queries
 
     location = db.relationship("Location", backref="restaurants")
 
 class Movie(db.Model):
     __tablename__ = "fc_movies"
+    __table_args__ = (
+        trigram_index("fc_movies", "mov_title"),
+        trigram_index("fc_movies", "mov_director"),
+    )
 
     mov_imdb_id = db.Column(db.String, primary_key=True)
     mov_title = db.Column(db.String, index=True)
@@ -82,6 +101,7 @@ class Movie(db.Model):
 
 class Genre(db.Model):
     __tablename__ = "fc_genres"
+    __table_args__ = (trigram_index("fc_genres", "gen_name"),)
 
     gen_id = db.Column(db.Integer, primary_key=True)
     gen_name = db.Column(db.String)
@@ -91,6 +111,7 @@ class Genre(db.Model):
 
 class Actor(db.Model):
     __tablename__ = "fc_actors"
+    __table_args__ = (trigram_index("fc_actors", "act_name"),)
 
     act_id = db.Column(db.Integer, primary_key=True)
     act_name = db.Column(db.String)
@@ -105,3 +126,40 @@ class FilmingLocation(db.Model):
 
     location = db.relationship("Location", backref="filming_locations")
     movie = db.relationship("Movie")
+
+class FilmingLocationRestaurant(db.Model):
+    __tablename__ = "fc_filming_location_restaurants"
+    __table_args__ = (
+        Index("idx_fc_filming_location_restaurants_location_distance", "flr_location_id", "flr_distance"),
+    )
+
+    flr_location_id = Column(Integer, ForeignKey("fc_locations.loc_id"), primary_key=True)
+    flr_restaurant_id = Column(Integer, ForeignKey("fc_restaurants.res_id"), primary_key=True)
+    flr_distance = Column(Float, nullable=False)  # In meters
+
+class MovieFacet(db.Model):
+    __tablename__ = "fc_movie_facets"
+
+    mf_facet = Column(String(30), primary_key=True)  # 'total', 'genre', 'year' or 'has_filming_location'
+    mf_value = Column(String(255), primary_key=True)
+    mf_count = Column(Integer, nullable=False)
+
+class LocationCluster(db.Model):
+    __tablename__ = "fc_location_clusters"
+
+    lc_kind = Column(String(20), primary_key=True)  # 'filming_location' or 'restaurant'
+    lc_zoom = Column(Integer, primary_key=True)
+    lc_cell_x = Column(Integer, primary_key=True)
+    lc_cell_y = Column(Integer, primary_key=True)
+    lc_latitude = Column(Float, nullable=False)  # Mean position of the points of the cell
+    lc_longitude = Column(Float, nullable=False)
+    lc_count = Column(Integer, nullable=False)
+
+class DatasetVersion(db.Model):
+    __tablename__ = "fc_dataset_version"
+
+    dv_id = Column(Integer, primary_key=True)
+    dv_version = Column(Integer, nullable=False)  # Incremented by the ingestion pipeline after each load
+    dv_loaded_at = Column(DateTime)
+    dv_proximity_radius = Column(Float)  # Radius covered by fc_filming_location_restaurants, None until it is built
+    dv_cluster_max_zoom = Column(Integer)  # Deepest zoom level in fc_location_clusters, None until it is built
@@ -0,0 +1,129 @@
+import base64
+import json
+import os
+from urllib.parse import urlencode
+from flask import request
+from sqlalchemy import tuple_
+
+# Page sizes can be tuned per deployment
+DEFAULT_PAGE_SIZE = int(os.getenv("API_DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key values of the last returned row into an opaque cursor.
+    """
+    payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor back into a list of sort key values.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid 'cursor' parameter.")
+    if not isinstance(values, list):
+        raise ValueError("Invalid 'cursor' parameter.")
+    return values
+
+
+def parse_page_args(args, streaming=False):
+    """
+    Extract the 'limit' and 'cursor' parameters from query arguments.
+
+    Parameters:
+        args (MultiDict): The request query arguments.
+        streaming (bool): Streamed responses are unbounded unless 'limit' is given.
+
+    Returns:
+        tuple: (limit, cursor_values) where cursor_values is None on the first page.
+    """
+    limit = args.get("limit", type=int, default=None if streaming else DEFAULT_PAGE_SIZE)
+    if limit is not None:
+        if limit < 1:
+            raise ValueError("The 'limit' parameter must be a positive integer.")
+        if not streaming:
+            limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def get_page_args(streaming=False):
+    """
+    Extract the 'limit' and 'cursor' query parameters of the current request.
+    """
+    return parse_page_args(request.args, streaming)
+
+
+def apply_keyset(query, sort_columns, cursor_values=None):
+    """
+    Order a query by sort_columns and keep only the rows strictly after the cursor.
+    """
+    query = query.order_by(*sort_columns)
+    if cursor_values is not None:
+        if len(cursor_values) != len(sort_columns):
+            raise ValueError("Invalid 'cursor' parameter.")
+        query = query.filter(tuple_(*sort_columns) > tuple_(*cursor_values))
+    return query
+
+
+def paginate(query, sort_columns, limit, cursor_values=None):
+    """
+    Apply keyset pagination to a query.
+
+    Rows are ordered by sort_columns (which must be unique together) and only rows
+    strictly after the cursor are fetched, so the database never has to skip over
+    previous pages.
+
+    Parameters:
+        query: The SQLAlchemy query to paginate.
+        sort_columns (list): Mapped columns forming the sort key.
+        limit (int): The maximum number of rows to return.
+        cursor_values (list): Sort key values decoded from the request cursor.
+
+    Returns:
+        tuple: (items, next_cursor) where next_cursor is None on the last page.
+    """
+    query = apply_keyset(query, sort_columns, cursor_values)
+
+    # Fetch one extra row to know whether another page exists
+    return split_page(query.limit(limit + 1).all(), sort_columns, limit)
+
+
+def split_page(items, sort_columns, limit):
+    """
+    Trim rows fetched with limit + 1 to one page and build the cursor of the next page.
+
+    Returns:
+        tuple: (items, next_cursor) where next_cursor is None on the last page.
+    """
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor([getattr(last, column.key) for column in sort_columns])
+
+
+def next_page_url(base_url, args, next_cursor):
+    """
+    Build the URL of the next page from the current URL and query arguments.
+    """
+    args = args.to_dict()
+    args["cursor"] = next_cursor
+    return f"{base_url}?{urlencode(args)}"
+
+
+def set_next_link(response, next_cursor):
+    """
+    Add an RFC 8288 'Link: <...>; rel="next"' header pointing to the next page.
+    """
+    if next_cursor:
+        response.headers["Link"] = f'<{next_page_url(request.base_url, request.args, next_cursor)}>; rel="next"'
+    return response
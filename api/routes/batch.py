@@ -0,0 +1,113 @@
+import logging
+import os
+from urllib.parse import parse_qsl, urlsplit
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+from database import db
+
+batch_bp = Blueprint("batch", __name__)
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of sub-requests accepted in one batch
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+
+API_PREFIX = "/api/v1/"
+
+# Headers of a sub-response returned alongside its body
+BATCH_RESPONSE_HEADERS = ("Link", "ETag")
+
+
+def parse_sub_request(sub_request):
+    """
+    Validate one sub-request of a batch.
+
+    Parameters:
+        sub_request (dict): {"path": "/api/v1/...", "params": {...}}, the query string may also be part of the path.
+
+    Returns:
+        tuple: (path, args) with the query string of the path and the params merged into args.
+    """
+    if not isinstance(sub_request, dict) or not isinstance(sub_request.get("path"), str):
+        raise ValueError("Each sub-request must be an object with a 'path'.")
+    if sub_request.get("method", "GET").upper() != "GET":
+        raise ValueError("Only GET sub-requests are supported.")
+
+    params = sub_request.get("params") or {}
+    if not isinstance(params, dict):
+        raise ValueError("'params' must be an object.")
+
+    url = urlsplit(sub_request["path"])
+    if not url.path.startswith(API_PREFIX) or url.path.rstrip("/") == API_PREFIX + "batch":
+        raise ValueError(f"Sub-request paths must start with '{API_PREFIX}' and cannot be a batch.")
+    args = MultiDict(parse_qsl(url.query, keep_blank_values=True))
+    for name, value in params.items():
+        if isinstance(value, list):
+            args.setlist(name, [str(item) for item in value])
+        else:
+            args[name] = str(value)
+    return url.path, args
+
+
+def run_sub_request(path, args):
+    """
+    Dispatch one GET sub-request to its view within the current application context,
+    so that every sub-request of a batch uses the same database session.
+
+    Only the view runs: the before/after_request hooks of the application (metrics,
+    query plans, compression) apply to the batch request as a whole, not to each sub-request.
+    An unexpected error of a sub-request becomes its own 500 entry and does not fail the batch.
+
+    Returns:
+        dict: status, selected headers and decoded JSON body of the sub-response.
+    """
+    builder = EnvironBuilder(
+        path=path, base_url=request.host_url, query_string=args, method="GET",
+        headers={"Accept": "application/json"},
+    )
+    with current_app.request_context(builder.get_environ()):
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except HTTPException as e:
+            return {"status": e.code, "headers": {}, "body": {"error": e.description}}
+        except Exception:
+            logger.exception("Sub-request %s of a batch failed.", path)
+            # A failed statement aborts the transaction shared with the next sub-requests
+            db.session.rollback()
+            return {"status": 500, "headers": {}, "body": {"error": "Internal server error."}}
+
+        if response.is_streamed:
+            return {"status": 400, "headers": {}, "body": {"error": "Streaming is not supported in batch requests."}}
+
+        return {
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in BATCH_RESPONSE_HEADERS if name in response.headers},
+            "body": response.get_json(silent=True),
+        }
+
+
+@batch_bp.route("/batch", methods=["POST"])
+def post_batch():
+    """
+    Handle POST requests combining several GET requests of the API in one round trip.
+
+    Body: {"requests": [{"path": "/api/v1/movies", "params": {"name": "Batman"}}, ...]}
+    The responses are returned in the same order, each with its own status.
+    """
+    payload = request.get_json(silent=True)
+    sub_requests = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({"error": "The body must be a JSON object with a non-empty 'requests' list."}), 400
+    if len(sub_requests) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"A batch cannot contain more than {BATCH_MAX_REQUESTS} requests."}), 400
+
+    try:
+        parsed = [parse_sub_request(sub_request) for sub_request in sub_requests]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Sub-requests run one after the other: they share the database session of this
+    # request, which cannot be used from several threads at once
+    return jsonify({"responses": [run_sub_request(*sub_request) for sub_request in parsed]})
@@ -0,0 +1,150 @@
+import os
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.sql import text
+from database import db
+from bbox import geography_envelope_bounds, parse_bbox
+from cache import cached
+from conditional import etag
+from dataset_version import get_cluster_max_zoom
+from models import LocationCluster
+
+clusters_bp = Blueprint("clusters", __name__)
+
+# Cells along each side of a map tile, same value as used by the ingestion pipeline
+CLUSTER_GRID_SIZE = int(os.getenv("CLUSTER_GRID_SIZE", "8"))
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "20"))
+# Deepest zoom level served without a bbox, the number of clusters growing with the zoom level
+CLUSTER_UNBOUNDED_MAX_ZOOM = int(os.getenv("CLUSTER_UNBOUNDED_MAX_ZOOM", "6"))
+
+CLUSTER_KINDS = ("filming_location", "restaurant")
+
+# Clusters of the zoom levels deeper than the precomputed ones, over the points of a bounding box.
+# Same grid as the ingestion pipeline: cells of the Web Mercator projection, numbered from the
+# top left corner of the world, the points on the east and south edges kept in the last cells.
+CLUSTERS_SQL = """
+    WITH points AS (
+        SELECT 'filming_location' AS kind, l.loc_latitude AS latitude, l.loc_longitude AS longitude
+        FROM fc_locations l
+        WHERE EXISTS (SELECT 1 FROM fc_filming_locations fl WHERE fl.fl_location_id = l.loc_id)
+          AND {spatial_filter}
+        UNION ALL
+        SELECT 'restaurant', l.loc_latitude, l.loc_longitude
+        FROM fc_restaurants r
+        JOIN fc_locations l ON l.loc_id = r.res_location_id
+        WHERE {spatial_filter}
+    )
+    SELECT
+        kind,
+        AVG(latitude) AS latitude,
+        AVG(longitude) AS longitude,
+        COUNT(*) AS count
+    FROM points
+    WHERE kind = ANY(:kinds)
+      AND latitude BETWEEN -85.0511 AND 85.0511
+    GROUP BY
+        kind,
+        LEAST(floor((longitude + 180) / 360 * :cells)::int, :cells - 1),
+        LEAST(floor((1 - ln(tan(radians(latitude)) + 1 / cos(radians(latitude))) / pi()) / 2 * :cells)::int, :cells - 1)
+    ORDER BY count DESC
+"""
+
+INDEXED_CLUSTER_FILTER = """l.loc_geography && ST_MakeEnvelope(:envelope_west, :envelope_south, :envelope_east, :envelope_north, 4326)::geography
+          AND l.loc_latitude BETWEEN :south AND :north AND l.loc_longitude BETWEEN :west AND :east"""
+WIDE_CLUSTER_FILTER = "l.loc_latitude BETWEEN :south AND :north AND l.loc_longitude BETWEEN :west AND :east"
+
+
+def parse_cluster_args(args):
+    """
+    Validate the /clusters query arguments.
+
+    Returns:
+        tuple: (zoom, bbox or None, kinds)
+    """
+    zoom = args.get("zoom", type=int)
+    if zoom is None or not 0 <= zoom <= CLUSTER_MAX_ZOOM:
+        raise ValueError(f"The 'zoom' parameter must be an integer between 0 and {CLUSTER_MAX_ZOOM}.")
+
+    bbox = parse_bbox(args["bbox"]) if args.get("bbox") else None
+
+    kinds = args.get("kind", ",".join(CLUSTER_KINDS)).split(",")
+    if not kinds or any(kind not in CLUSTER_KINDS for kind in kinds):
+        raise ValueError(f"The 'kind' parameter must be a comma-separated list of {', '.join(CLUSTER_KINDS)}.")
+    return zoom, bbox, kinds
+
+
+def precomputed_clusters_statement(zoom, bbox, kinds):
+    """
+    Read the clusters of a zoom level from fc_location_clusters.
+    """
+    statement = select(
+        LocationCluster.lc_kind.label("kind"),
+        LocationCluster.lc_latitude.label("latitude"),
+        LocationCluster.lc_longitude.label("longitude"),
+        LocationCluster.lc_count.label("count"),
+    ).where(LocationCluster.lc_zoom == zoom, LocationCluster.lc_kind.in_(kinds))
+    if bbox is not None:
+        west, south, east, north = bbox
+        statement = statement.where(
+            LocationCluster.lc_latitude.between(south, north),
+            LocationCluster.lc_longitude.between(west, east),
+        )
+    return statement.order_by(LocationCluster.lc_count.desc())
+
+
+def clusters_query(zoom, bbox, kinds):
+    """
+    Build the statement clustering the points of a bounding box on the fly.
+
+    Returns:
+        tuple: (sql_query, params)
+    """
+    west, south, east, north = bbox
+    params = {
+        "kinds": kinds, "cells": 2 ** zoom * CLUSTER_GRID_SIZE,
+        "west": west, "south": south, "east": east, "north": north,
+    }
+    envelope_bounds = geography_envelope_bounds(bbox)
+    if envelope_bounds is None:
+        spatial_filter = WIDE_CLUSTER_FILTER
+    else:
+        spatial_filter = INDEXED_CLUSTER_FILTER
+        params.update(zip(("envelope_west", "envelope_south", "envelope_east", "envelope_north"), envelope_bounds))
+    return text(CLUSTERS_SQL.format(spatial_filter=spatial_filter)), params
+
+
+@clusters_bp.route("/clusters", methods=["GET"])
+@etag
+@cached
+def get_clusters():
+    """
+    Handle GET requests for the filming locations and restaurants grouped by grid cell at a zoom level.
+    """
+    try:
+        zoom, bbox, kinds = parse_cluster_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if bbox is None and zoom > CLUSTER_UNBOUNDED_MAX_ZOOM:
+        return jsonify({"error": f"The 'bbox' parameter is required above zoom level {CLUSTER_UNBOUNDED_MAX_ZOOM}."}), 400
+
+    cluster_max_zoom = get_cluster_max_zoom()
+    if cluster_max_zoom is not None and zoom <= cluster_max_zoom:
+        # Low zoom levels are read from the clusters built after each load
+        rows = db.session.execute(precomputed_clusters_statement(zoom, bbox, kinds)).mappings()
+    elif bbox is None:
+        return jsonify({"error": "The 'bbox' parameter is required at this zoom level."}), 400
+    else:
+        # Deeper zoom levels only cover a small area, clustered on the fly
+        sql_query, params = clusters_query(zoom, bbox, kinds)
+        rows = db.session.execute(sql_query, params).mappings()
+
+    return jsonify([
+        {
+            "kind": row["kind"],
+            "latitude": round(row["latitude"], 6),
+            "longitude": round(row["longitude"], 6),
+            "count": row["count"],
+        }
+        for row in rows
+    ])
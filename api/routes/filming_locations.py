@@ -1,27 +1,38 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.sql import text
 from database import db
+from bbox import bbox_condition, parse_bbox
+from cache import cached
+from conditional import etag
 from models import FilmingLocation, Movie, Genre, Actor
-from schemas import FilmingLocationSchema
+from serializers import dump_filming_location
+from pagination import get_page_args, paginate, set_next_link
+from streaming import wants_stream, stream_query
 
 filming_locations_bp = Blueprint("filming_locations", __name__)
 
-# Define schema
-filming_locations_schema = FilmingLocationSchema(many=True)
+# Filming locations are paginated by their composite key
+filming_location_sort_columns = [FilmingLocation.fl_location_id, FilmingLocation.fl_imdb_id]
 
-@filming_locations_bp.route("/filming-locations", methods=["GET"])
-def get_filming_locations():
+
+def apply_filming_location_filters(query, args):
     """
-    Handle GET requests to fetch all or filtered filming locations.
+    Join a query or select() statement over FilmingLocation to its movie and location,
+    populating both from the joins, and apply the filters of /filming-locations.
+    Raises ValueError on an invalid bbox.
     """
     # Extract query parameters
-    movie_name = request.args.get("movie_name")
-    genre = request.args.get("genre")
-    actor = request.args.get("actor")
-    imdb_id = request.args.get("imdb_id")
+    movie_name = args.get("movie_name")
+    genre = args.get("genre")
+    actor = args.get("actor")
+    imdb_id = args.get("imdb_id")
+    bbox = args.get("bbox")
 
-    # Build the query dynamically
-    query = db.session.query(FilmingLocation).join(FilmingLocation.movie).join(FilmingLocation.location)
+    query = query.join(FilmingLocation.movie).join(FilmingLocation.location).options(
+        contains_eager(FilmingLocation.movie),
+        contains_eager(FilmingLocation.location)
+    )
 
     if movie_name:
         query = query.filter(Movie.mov_title.ilike(f"%{movie_name}%"))
@@ -31,9 +42,31 @@ def get_filming_locations():
         query = query.join(Movie.actors).filter(Actor.act_name.ilike(f"%{actor}%"))
     if imdb_id:
         query = query.filter(Movie.mov_imdb_id == imdb_id)
+    if bbox:
+        query = query.filter(bbox_condition(parse_bbox(bbox)))
+    return query
+
+
+@filming_locations_bp.route("/filming-locations", methods=["GET"])
+@etag
+@cached
+def get_filming_locations():
+    """
+    Handle GET requests to fetch all or filtered filming locations.
+    """
+    sort_columns = filming_location_sort_columns
+    try:
+        # Build the query dynamically
+        query = apply_filming_location_filters(db.session.query(FilmingLocation), request.args)
+
+        if wants_stream():
+            return stream_query(query, sort_columns, dump_filming_location)
 
-    # Execute the query
-    filming_locations = query.all()
+        # Execute the query for one page of results
+        limit, cursor = get_page_args()
+        filming_locations, next_cursor = paginate(query, sort_columns, limit, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Serialize the results
-    return jsonify(filming_locations_schema.dump(filming_locations))
+    return set_next_link(jsonify([dump_filming_location(filming_location) for filming_location in filming_locations]), next_cursor)
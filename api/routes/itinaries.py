@@ -1,120 +1,290 @@
-from flask import Blueprint, jsonify, request
+import os
+from flask import Blueprint, Response, jsonify, request
 from sqlalchemy.sql import text
 from database import db
+from cache import cached
+from dataset_version import get_proximity_radius
+from streaming import STREAM_BATCH_SIZE, wants_stream, stream_ndjson
+from walking_tour import order_itineraries_route
 
 # Create Blueprint
 itineraries_bp = Blueprint("itineraries", __name__)
 
-@itineraries_bp.route("/itineraries", methods=["GET"])
-def get_itineraries():
+# Default execution path, either "python" (flat rows grouped in Python) or "sql" (documents built by Postgres)
+ITINERARY_AGGREGATION = os.getenv("ITINERARY_AGGREGATION", "python")
+
+# Server-side bounds on the size of an itinerary
+ITINERARY_MAX_DISTANCE = int(os.getenv("ITINERARY_MAX_DISTANCE", "2000"))  # In meters
+ITINERARY_DEFAULT_RESTAURANTS_PER_LOCATION = int(os.getenv("ITINERARY_DEFAULT_RESTAURANTS_PER_LOCATION", "10"))
+ITINERARY_MAX_RESTAURANTS_PER_LOCATION = int(os.getenv("ITINERARY_MAX_RESTAURANTS_PER_LOCATION", "50"))
+
+# Restaurant columns of an itinerary row
+ITINERARY_RESTAURANT_COLUMNS = """
+            r.res_id,
+            r.res_name,
+            r.res_doing_business_as_dba,
+            r.res_seating_interest_sidewalk,
+            l.loc_id AS restaurant_loc_id,
+            l.loc_city AS restaurant_loc_city,
+            l.loc_country AS restaurant_loc_country,
+            l.loc_country_code AS restaurant_loc_country_code,
+            l.loc_house_number AS restaurant_loc_house_number,
+            l.loc_neighborhood AS restaurant_loc_neighborhood,
+            l.loc_postcode AS restaurant_loc_postcode,
+            l.loc_road AS restaurant_loc_road,
+            l.loc_state AS restaurant_loc_state,
+            l.loc_suburb AS restaurant_loc_suburb"""
+
+# Nearest restaurants of each filming location, read from the GiST index in distance order
+KNN_RESTAURANTS_NEARBY = """
+        SELECT""" + ITINERARY_RESTAURANT_COLUMNS + """,
+            ST_Distance(l1.loc_geography, l.loc_geography) AS distance
+        FROM fc_locations l
+        JOIN fc_restaurants r ON r.res_location_id = l.loc_id
+        WHERE ST_DWithin(l.loc_geography, l1.loc_geography, :distance)
+        ORDER BY l.loc_geography <-> l1.loc_geography
+        LIMIT :max_restaurants_per_location
     """
-    Generate a tourism itinerary based on selected movies and nearby restaurants.
+
+# Same restaurants read from the proximity table built by the pipeline, when the
+# requested distance is within its radius
+PRECOMPUTED_RESTAURANTS_NEARBY = """
+        SELECT""" + ITINERARY_RESTAURANT_COLUMNS + """,
+            p.flr_distance AS distance
+        FROM fc_filming_location_restaurants p
+        JOIN fc_restaurants r ON r.res_id = p.flr_restaurant_id
+        JOIN fc_locations l ON l.loc_id = r.res_location_id
+        WHERE p.flr_location_id = l1.loc_id
+          AND p.flr_distance <= :distance
+        ORDER BY p.flr_distance, r.res_id
+        LIMIT :max_restaurants_per_location
+    """
+
+# One row per (movie, filming location, nearby restaurant), restaurants_nearby being
+# KNN_RESTAURANTS_NEARBY or PRECOMPUTED_RESTAURANTS_NEARBY
+ITINERARY_ROWS_SQL = """
+    SELECT
+        m.mov_imdb_id,
+        m.mov_title,
+        fl.fl_location_id,
+        l1.loc_id AS filming_loc_id,
+        l1.loc_name AS filming_loc_name,
+        l1.loc_display_name AS filming_loc_display_name,
+        l1.loc_address_type AS filming_loc_address_type,
+        l1.loc_city AS filming_loc_city,
+        l1.loc_country AS filming_loc_country,
+        l1.loc_latitude AS filming_loc_latitude,
+        l1.loc_longitude AS filming_loc_longitude,
+        rl.res_id AS restaurant_id,
+        rl.res_name AS restaurant_name,
+        rl.res_doing_business_as_dba,
+        rl.res_seating_interest_sidewalk,
+        rl.restaurant_loc_id,
+        rl.restaurant_loc_city,
+        rl.restaurant_loc_country,
+        rl.restaurant_loc_country_code,
+        rl.restaurant_loc_house_number,
+        rl.restaurant_loc_neighborhood,
+        rl.restaurant_loc_postcode,
+        rl.restaurant_loc_road,
+        rl.restaurant_loc_state,
+        rl.restaurant_loc_suburb,
+        rl.distance
+    FROM fc_movies m
+    JOIN fc_filming_locations fl ON fl.fl_imdb_id = m.mov_imdb_id
+    JOIN fc_locations l1 ON fl.fl_location_id = l1.loc_id
+    LEFT JOIN LATERAL ({restaurants_nearby}) rl ON TRUE
+    WHERE m.mov_imdb_id = ANY(:imdb_ids)
+"""
+
+ITINERARY_ROWS_ORDER_BY = """
+    ORDER BY m.mov_title, m.mov_imdb_id, l1.loc_name, l1.loc_id, distance ASC
+"""
+
+# Same rows, aggregated by Postgres into one JSON document per movie
+ITINERARY_DOCUMENTS_SQL = """
+    WITH itinerary_rows AS (""" + ITINERARY_ROWS_SQL + """),
+    itinerary_locations AS (
+        SELECT
+            mov_imdb_id,
+            mov_title,
+            filming_loc_id,
+            filming_loc_name,
+            json_build_object(
+                'id', filming_loc_id,
+                'display_name', filming_loc_display_name,
+                'address_type', filming_loc_address_type,
+                'city', filming_loc_city,
+                'country', filming_loc_country,
+                'latitude', filming_loc_latitude,
+                'longitude', filming_loc_longitude,
+                'restaurants_nearby', COALESCE(
+                    json_agg(
+                        json_build_object(
+                            'id', restaurant_id,
+                            'name', restaurant_name,
+                            'doing_business_as', res_doing_business_as_dba,
+                            'seating_interest', res_seating_interest_sidewalk,
+                            'location', json_build_object(
+                                'loc_city', restaurant_loc_city,
+                                'loc_country', restaurant_loc_country,
+                                'loc_country_code', restaurant_loc_country_code,
+                                'loc_house_number', restaurant_loc_house_number,
+                                'loc_neighborhood', restaurant_loc_neighborhood,
+                                'loc_postcode', restaurant_loc_postcode,
+                                'loc_road', restaurant_loc_road,
+                                'loc_state', restaurant_loc_state,
+                                'loc_suburb', restaurant_loc_suburb
+                            ),
+                            'distance', distance
+                        ) ORDER BY distance
+                    ) FILTER (WHERE restaurant_id IS NOT NULL),
+                    '[]'::json
+                )
+            ) AS filming_location
+        FROM itinerary_rows
+        GROUP BY mov_imdb_id, mov_title, filming_loc_id, filming_loc_name, filming_loc_display_name,
+                 filming_loc_address_type, filming_loc_city, filming_loc_country,
+                 filming_loc_latitude, filming_loc_longitude
+    )
+    SELECT
+        json_build_object(
+            'mov_imdb_id', mov_imdb_id,
+            'mov_title', mov_title,
+            'filming_locations', json_agg(filming_location ORDER BY filming_loc_name, filming_loc_id)
+        )::text AS itinerary
+    FROM itinerary_locations
+    GROUP BY mov_imdb_id, mov_title
+    ORDER BY mov_title, mov_imdb_id
+"""
+
+def itinerary_query(args, proximity_radius=None):
+    """
+    Validate the /itineraries query arguments and build the statement of the selected execution path.
+    Restaurants are read from the proximity table when the distance is within proximity_radius.
+    With order=route, the documents are reordered by the API, so the rows are always grouped in Python.
+
+    Returns:
+        tuple: (sql_query, params, aggregation, order)
     """
     # Extract query parameters
-    imdb_ids = request.args.get("imdb_ids", "")
-    distance = request.args.get("distance", type=int, default=400)  # Default to 400 meters
+    imdb_ids = args.get("imdb_ids", "")
+    distance = args.get("distance", type=int, default=400)  # Default to 400 meters
+    max_restaurants_per_location = args.get(
+        "max_restaurants_per_location", type=int, default=ITINERARY_DEFAULT_RESTAURANTS_PER_LOCATION
+    )
+    aggregation = args.get("aggregation", ITINERARY_AGGREGATION)
+    order = args.get("order", "name")
 
     if not imdb_ids:
-        return jsonify({"error": "You must provide a list of IMDb IDs in the 'imdb_ids' parameter."}), 400
-
-    # Convert comma-separated IMDb IDs into a list
-    imdb_ids = imdb_ids.split(",")
-
-    # Define SQL query
-    sql_query = text("""
-        WITH restaurant_locations AS (
-            SELECT
-                r.res_id,
-                r.res_name,
-                r.res_doing_business_as_dba,
-                r.res_seating_interest_sidewalk,
-                l.loc_id AS restaurant_loc_id,
-                l.loc_name AS restaurant_loc_name,
-                l.loc_city AS restaurant_loc_city,
-                l.loc_country AS restaurant_loc_country,
-                l.loc_country_code AS restaurant_loc_country_code,
-                l.loc_house_number AS restaurant_loc_house_number,
-                l.loc_neighborhood AS restaurant_loc_neighborhood,
-                l.loc_postcode AS restaurant_loc_postcode,
-                l.loc_road AS restaurant_loc_road,
-                l.loc_state AS restaurant_loc_state,
-                l.loc_suburb AS restaurant_loc_suburb,
-                l.loc_geography AS restaurant_geography
-            FROM fc_restaurants r
-            JOIN fc_locations l ON r.res_location_id = l.loc_id
-        )
-        SELECT
-            m.mov_imdb_id,
-            m.mov_title,
-            fl.fl_location_id,
-            l1.loc_id AS filming_loc_id,
-            l1.loc_name AS filming_loc_name,
-            l1.loc_display_name AS filming_loc_display_name,
-            l1.loc_address_type AS filming_loc_address_type,
-            l1.loc_city AS filming_loc_city,
-            l1.loc_country AS filming_loc_country,
-            rl.res_id AS restaurant_id,
-            rl.res_name AS restaurant_name,
-            rl.res_doing_business_as_dba,
-            rl.res_seating_interest_sidewalk,
-            rl.restaurant_loc_id,
-            rl.restaurant_loc_city,
-            rl.restaurant_loc_country,
-            rl.restaurant_loc_country_code,
-            rl.restaurant_loc_house_number,
-            rl.restaurant_loc_neighborhood,
-            rl.restaurant_loc_postcode,
-            rl.restaurant_loc_road,
-            rl.restaurant_loc_state,
-            rl.restaurant_loc_suburb,
-            ST_Distance(l1.loc_geography, rl.restaurant_geography) AS distance
-        FROM fc_movies m
-        JOIN fc_filming_locations fl ON fl.fl_imdb_id = m.mov_imdb_id
-        JOIN fc_locations l1 ON fl.fl_location_id = l1.loc_id
-        LEFT JOIN restaurant_locations rl ON ST_DWithin(l1.loc_geography, rl.restaurant_geography, :distance)
-        WHERE m.mov_imdb_id = ANY(:imdb_ids)
-        ORDER BY m.mov_title, l1.loc_name, distance ASC;
-    """)
+        raise ValueError("You must provide a list of IMDb IDs in the 'imdb_ids' parameter.")
+    if distance < 0:
+        raise ValueError("The 'distance' parameter must not be negative.")
+    if max_restaurants_per_location < 0:
+        raise ValueError("The 'max_restaurants_per_location' parameter must not be negative.")
+    if aggregation not in ("python", "sql"):
+        raise ValueError("The 'aggregation' parameter must be either 'python' or 'sql'.")
+    if order not in ("name", "route"):
+        raise ValueError("The 'order' parameter must be either 'name' or 'route'.")
+    if order == "route":
+        aggregation = "python"
+
+    # Cap the search radius and the number of restaurants per filming location
+    distance = min(distance, ITINERARY_MAX_DISTANCE)
+    max_restaurants_per_location = min(max_restaurants_per_location, ITINERARY_MAX_RESTAURANTS_PER_LOCATION)
+
+    params = {
+        "imdb_ids": imdb_ids.split(","),  # Convert comma-separated IMDb IDs into a list
+        "distance": distance,
+        "max_restaurants_per_location": max_restaurants_per_location
+    }
+    if proximity_radius is not None and distance <= proximity_radius:
+        restaurants_nearby = PRECOMPUTED_RESTAURANTS_NEARBY
+    else:
+        restaurants_nearby = KNN_RESTAURANTS_NEARBY
+
+    if aggregation == "sql":
+        sql_query = ITINERARY_DOCUMENTS_SQL
+    else:
+        sql_query = ITINERARY_ROWS_SQL + ITINERARY_ROWS_ORDER_BY
+    return text(sql_query.format(restaurants_nearby=restaurants_nearby)), params, aggregation, order
+
+
+@itineraries_bp.route("/itineraries", methods=["GET"])
+@cached
+def get_itineraries():
+    """
+    Generate a tourism itinerary based on selected movies and nearby restaurants.
+    Filming locations are sorted by name, or into a walking tour with order=route.
+    """
+    try:
+        sql_query, params, aggregation, order = itinerary_query(request.args, get_proximity_radius())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Execute query with parameters
-    result = db.session.execute(sql_query, {"imdb_ids": imdb_ids, "distance": distance})
-
-    # Process results
-    itineraries = {}
-    for row in result.mappings():
-        mov_imdb_id = row["mov_imdb_id"]
-        mov_title = row["mov_title"]
-        filming_location_id = row["filming_loc_id"]
-        restaurant_id = row["restaurant_id"]
-
-        # Initialize movie in response if not already present
-        if mov_imdb_id not in itineraries:
-            itineraries[mov_imdb_id] = {
-                "mov_imdb_id": mov_imdb_id,
-                "mov_title": mov_title,
+    stream = wants_stream()
+    execution_options = {"yield_per": STREAM_BATCH_SIZE} if stream else {}
+    result = db.session.execute(sql_query, params, execution_options=execution_options)
+
+    if aggregation == "sql":
+        # Postgres returns each itinerary as JSON text, which is sent without being decoded
+        documents = result.scalars()
+        if stream:
+            return stream_ndjson(documents, encoded=True)
+        return Response("[" + ",".join(documents) + "]", mimetype="application/json")
+
+    itineraries = group_itineraries(result.mappings())
+    if order == "route":
+        itineraries = order_itineraries_route(itineraries)
+
+    if stream:
+        # Pull rows from a server-side cursor and emit each movie as soon as it is complete
+        return stream_ndjson(itineraries)
+
+    # Convert the itineraries into a list for JSON serialization
+    return jsonify(list(itineraries))
+
+
+def group_itineraries(rows):
+    """
+    Group flat (movie, filming location, restaurant) rows into one itinerary per movie.
+
+    Rows must be ordered so that the rows of each movie, and of each of its filming
+    locations, are contiguous. Itineraries are yielded as soon as they are complete.
+    """
+    itinerary = None
+    filming_location = None
+    for row in rows:
+        # Start a new movie when the IMDb ID changes
+        if itinerary is None or itinerary["mov_imdb_id"] != row["mov_imdb_id"]:
+            if itinerary is not None:
+                yield itinerary
+            itinerary = {
+                "mov_imdb_id": row["mov_imdb_id"],
+                "mov_title": row["mov_title"],
                 "filming_locations": []
             }
+            filming_location = None
 
-        # Find or create the filming location in the response
-        filming_location = next(
-            (loc for loc in itineraries[mov_imdb_id]["filming_locations"] if loc["id"] == filming_location_id),
-            None
-        )
-        if not filming_location:
+        # Start a new filming location when the location ID changes
+        if filming_location is None or filming_location["id"] != row["filming_loc_id"]:
             filming_location = {
-                "id": filming_location_id,
+                "id": row["filming_loc_id"],
                 "display_name": row["filming_loc_display_name"],
                 "address_type": row["filming_loc_address_type"],
                 "city": row["filming_loc_city"],
                 "country": row["filming_loc_country"],
+                "latitude": row["filming_loc_latitude"],
+                "longitude": row["filming_loc_longitude"],
                 "restaurants_nearby": []
             }
-            itineraries[mov_imdb_id]["filming_locations"].append(filming_location)
+            itinerary["filming_locations"].append(filming_location)
 
         # Add restaurant to the filming location if available
-        if restaurant_id:
+        if row["restaurant_id"]:
             filming_location["restaurants_nearby"].append({
-                "id": restaurant_id,
+                "id": row["restaurant_id"],
                 "name": row["restaurant_name"],
                 "doing_business_as": row["res_doing_business_as_dba"],
                 "seating_interest": row["res_seating_interest_sidewalk"],
@@ -132,5 +302,5 @@ def get_itineraries():
                 "distance": row["distance"]
             })
 
-    # Convert the itineraries dictionary into a list for JSON serialization
-    return jsonify(list(itineraries.values()))
+    if itinerary is not None:
+        yield itinerary
@@ -1,27 +1,29 @@
 from flask import Blueprint, jsonify, request
 from sqlalchemy.orm import joinedload
 from database import db
+from bbox import bbox_condition, parse_bbox
+from cache import cached
+from conditional import etag
 from models import Location
-from schemas import LocationSchema
+from serializers import LOCATION_FIELDS, dump_location
+from pagination import get_page_args, paginate, set_next_link
+from streaming import wants_stream, stream_query
 
 locations_bp = Blueprint("locations", __name__)
 
-# Define schema
-locations_schema = LocationSchema(many=True)
-location_schema = LocationSchema()
+# Only the serialized columns are selected, rows are dumped without building ORM objects
+location_columns = [getattr(Location, field) for field in LOCATION_FIELDS]
 
-@locations_bp.route("/locations", methods=["GET"])
-def get_locations():
+def apply_location_filters(query, args):
     """
-    Handle GET requests to fetch all or filtered locations.
+    Apply the filters of /locations to a query or select() statement over Location.
+    Raises ValueError on an invalid bbox.
     """
     # Extract query parameters
-    city = request.args.get("city")
-    suburb = request.args.get("suburb")
-    country_code = request.args.get("country_code")
-
-    # Build the query dynamically
-    query = db.session.query(Location)
+    city = args.get("city")
+    suburb = args.get("suburb")
+    country_code = args.get("country_code")
+    bbox = args.get("bbox")
 
     if city:
         query = query.filter(Location.loc_city.ilike(f"%{city}%"))
@@ -29,8 +31,30 @@ def get_locations():
         query = query.filter(Location.loc_suburb.ilike(f"%{suburb}%"))
     if country_code:
         query = query.filter(Location.loc_country_code.ilike(f"%{country_code}%"))
+    if bbox:
+        query = query.filter(bbox_condition(parse_bbox(bbox)))
+    return query
+
+
+@locations_bp.route("/locations", methods=["GET"])
+@etag
+@cached
+def get_locations():
+    """
+    Handle GET requests to fetch all or filtered locations.
+    """
+    try:
+        # Build the query dynamically
+        query = apply_location_filters(db.session.query(*location_columns), request.args)
+
+        if wants_stream():
+            return stream_query(query, [Location.loc_id], dump_location)
 
-    locations = query.all()
+        # Fetch one page of results ordered by location ID
+        limit, cursor = get_page_args()
+        locations, next_cursor = paginate(query, [Location.loc_id], limit, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Serialize the result
-    return jsonify(locations_schema.dump(locations))
+    return set_next_link(jsonify([dump_location(location) for location in locations]), next_cursor)
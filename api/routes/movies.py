@@ -1,30 +1,35 @@
-from sqlalchemy.orm import joinedload
+from sqlalchemy import String, cast, exists, func, literal, select, union_all
+from sqlalchemy.orm import load_only, selectinload
 
-from models import Movie, Genre, Actor
+from models import Movie, Genre, Actor, FilmingLocation, MovieFacet, fc_genres_movies
 from flask import Blueprint, jsonify, request
 from sqlalchemy.sql import text
-from schemas import MovieSchema
+from serializers import MOVIE_FIELDS, MOVIE_RELATIONSHIPS, compile_movie_serializer, dump_movie
 from database import db
+from cache import cached
+from pagination import get_page_args, paginate, set_next_link
+from streaming import wants_stream, stream_query
 
 movies_bp = Blueprint("movies", __name__)
-movie_schema = MovieSchema()
-movies_schema = MovieSchema(many=True)
 
-@movies_bp.route("/movies", methods=["GET"])
-def get_movies():
+# Query parameters filtering the movies (see apply_movie_filters)
+MOVIE_FILTER_ARGS = ("name", "year", "director", "has_filming_location", "genre", "actor")
+
+# Facet names of fc_movie_facets and their key in the /movies/facets response
+MOVIE_FACETS = {"genre": "genres", "year": "years", "has_filming_location": "has_filming_location"}
+
+
+def apply_movie_filters(query, args):
+    """
+    Apply the filters of /movies to a query or select() statement over Movie.
+    """
     # Extract query parameters
-    name = request.args.get("name")
-    year = request.args.get("year", type=int)
-    director = request.args.get("director")
-    has_filming_location = request.args.get("has_filming_location", type=lambda v: v.lower() == 'true')
-    genre_name = request.args.get("genre")
-    actor_name = request.args.get("actor")
-
-    # Build the query dynamically
-    query = db.session.query(Movie).options(
-        joinedload(Movie.genres),
-        joinedload(Movie.actors)
-    )
+    name = args.get("name")
+    year = args.get("year", type=int)
+    director = args.get("director")
+    has_filming_location = args.get("has_filming_location", type=lambda v: v.lower() == 'true')
+    genre_name = args.get("genre")
+    actor_name = args.get("actor")
 
     if name:
         query = query.filter(Movie.mov_title.ilike(f"%{name}%"))
@@ -41,8 +46,126 @@ def get_movies():
         query = query.filter(Movie.genres.any(Genre.gen_name.ilike(f"%{genre_name}%")))
     if actor_name:
         query = query.filter(Movie.actors.any(Actor.act_name.ilike(f"%{actor_name}%")))
+    return query
+
+
+def movie_fields_options(fields):
+    """
+    Resolve the 'fields' parameter into loader options and a matching serializer.
+
+    Returns:
+        tuple: (options, dump) restricting the loaded columns and relationships to the requested fields.
+    """
+    if fields:
+        fields = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown_fields = fields - set(MOVIE_FIELDS) - set(MOVIE_RELATIONSHIPS)
+        if unknown_fields:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown_fields))}.")
+        # The IMDb ID is always loaded: it is the keyset cursor and load_only needs at least one column
+        columns = [getattr(Movie, field) for field in MOVIE_FIELDS if field in fields and field != "mov_imdb_id"]
+        options = [load_only(Movie.mov_imdb_id, *columns)]
+        relationships = [field for field in MOVIE_RELATIONSHIPS if field in fields]
+        dump = compile_movie_serializer(fields)
+    else:
+        options = []
+        relationships = MOVIE_RELATIONSHIPS
+        dump = dump_movie
+
+    # Genres and actors are fetched with one extra query each for the whole page,
+    # a joinedload of both would return the genres x actors product of every movie
+    options += [selectinload(getattr(Movie, relationship)) for relationship in relationships]
+    return options, dump
+
+
+@movies_bp.route("/movies", methods=["GET"])
+@cached
+def get_movies():
+    try:
+        # Restrict the loaded columns and relationships to the requested fields
+        options, dump = movie_fields_options(request.args.get("fields"))
+
+        # Build the query dynamically
+        query = apply_movie_filters(db.session.query(Movie).options(*options), request.args)
+
+        if wants_stream():
+            return stream_query(query, [Movie.mov_imdb_id], dump)
+
+        # Fetch one page of results ordered by IMDb ID
+        limit, cursor = get_page_args()
+        movies, next_cursor = paginate(query, [Movie.mov_imdb_id], limit, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Serialize the response
+    return set_next_link(jsonify([dump(movie) for movie in movies]), next_cursor)
+
+
+def movie_facets_statement(args):
+    """
+    Build a single statement counting the movies matching the /movies filters in total,
+    per genre, per year and with or without filming locations.
+
+    Returns:
+        A UNION ALL statement of (facet, value, count) rows, like fc_movie_facets.
+    """
+    filtered = apply_movie_filters(select(Movie.mov_imdb_id, Movie.mov_year), args).cte("filtered_movies")
+
+    total = select(
+        literal("total", String).label("facet"), literal("", String).label("value"), func.count().label("count")
+    ).select_from(filtered)
+    genres = (
+        select(literal("genre", String), Genre.gen_name, func.count(filtered.c.mov_imdb_id.distinct()))
+        .select_from(filtered)
+        .join(fc_genres_movies, fc_genres_movies.c.gm_imdb_id == filtered.c.mov_imdb_id)
+        .join(Genre, Genre.gen_id == fc_genres_movies.c.gm_genre_id)
+        .where(Genre.gen_name.isnot(None))
+        .group_by(Genre.gen_name)
+    )
+    years = (
+        select(literal("year", String), cast(filtered.c.mov_year, String), func.count())
+        .where(filtered.c.mov_year.isnot(None))
+        .group_by(filtered.c.mov_year)
+    )
+    with_filming_location = (
+        select(exists().where(FilmingLocation.fl_imdb_id == filtered.c.mov_imdb_id).label("has_filming_location"))
+        .select_from(filtered)
+        .subquery()
+    )
+    has_filming_location = (
+        select(
+            literal("has_filming_location", String),
+            cast(with_filming_location.c.has_filming_location, String),
+            func.count(),
+        )
+        .group_by(with_filming_location.c.has_filming_location)
+    )
+    return union_all(total, genres, years, has_filming_location)
+
+
+def group_movie_facets(rows):
+    """
+    Convert (facet, value, count) rows into the /movies/facets document.
+    """
+    facets = {"total": 0, **{key: {} for key in MOVIE_FACETS.values()}}
+    for facet, value, count in rows:
+        if facet == "total":
+            facets["total"] = count
+        else:
+            facets[MOVIE_FACETS[facet]][value] = count
+    return facets
+
 
-    movies = query.all()
+@movies_bp.route("/movies/facets", methods=["GET"])
+@cached
+def get_movie_facets():
+    """
+    Handle GET requests counting the movies per genre, per year and with or without filming
+    locations, for the same filters as /movies. Without filters, the counts precomputed by the
+    ingestion pipeline are returned.
+    """
+    if not any(request.args.get(name) for name in MOVIE_FILTER_ARGS):
+        rows = db.session.execute(select(MovieFacet.mf_facet, MovieFacet.mf_value, MovieFacet.mf_count)).all()
+        if rows:
+            return jsonify(group_movie_facets(rows))
 
-    # Use movies_schema to serialize the response
-    return jsonify(movies_schema.dump(movies))
\ No newline at end of file
+    return jsonify(group_movie_facets(db.session.execute(movie_facets_statement(request.args)).all()))
@@ -1,132 +1,270 @@
+import os
 from flask import Blueprint, jsonify, request
 from sqlalchemy.sql import text
 from database import db
+from cache import cached
+from dataset_version import get_proximity_radius
 from models import Restaurant, Location
-from schemas import RestaurantSchema
+from routes.itinaries import ITINERARY_MAX_DISTANCE
+from serializers import dump_restaurant_row
+from spatial_index import NEARBY_ENGINE, get_restaurant_index
 
 restaurants_bp = Blueprint("restaurants", __name__)
 
-# Define schema
-restaurants_schema = RestaurantSchema(many=True)
-@restaurants_bp.route("/restaurants", methods=["GET"])
-def get_restaurants():
+# Restaurant and location columns of a nearby restaurant row (see dump_restaurant_row)
+NEARBY_RESTAURANT_COLUMNS = """r.res_id,
+           r.res_name,
+           r.res_doing_business_as_dba,
+           r.res_seating_interest_sidewalk,
+           l.loc_id AS l_loc_id,
+           l.loc_name AS l_loc_name,
+           l.loc_city AS l_loc_city,
+           l.loc_country AS l_loc_country,
+           l.loc_country_code AS l_loc_country_code,
+           l.loc_county AS l_loc_county,
+           l.loc_display_name AS l_loc_display_name,
+           l.loc_house_number AS l_loc_house_number,
+           l.loc_iso3166_2_lvl4 AS l_loc_iso3166_2_lvl4,
+           l.loc_latitude AS l_loc_latitude,
+           l.loc_longitude AS l_loc_longitude,
+           l.loc_neighborhood AS l_loc_neighborhood,
+           l.loc_postcode AS l_loc_postcode,
+           l.loc_road AS l_loc_road,
+           l.loc_state AS l_loc_state,
+           l.loc_suburb AS l_loc_suburb"""
+
+# Nearest restaurants around an origin point. The ST_DWithin bound and the
+# KNN ordering (<->) are both answered by the GiST index on loc_geography,
+# so only the rows actually returned are read instead of the whole table.
+# For geography, <-> is the sphere distance while ST_Distance is measured on the spheroid:
+# restaurants a few centimeters apart may come in a different order than their 'distance'.
+NEARBY_RESTAURANTS_SQL = """
+    SELECT {columns},
+           ST_Distance({origin}, l.loc_geography) AS distance
+    FROM fc_locations l
+    JOIN fc_restaurants r ON r.res_location_id = l.loc_id
+    WHERE ST_DWithin(l.loc_geography, {origin}, :distance)
+      AND (r.res_seating_interest_sidewalk = :seating_interest OR :seating_interest IS NULL)
+    ORDER BY l.loc_geography <-> {origin}
+    LIMIT 10
+"""
+
+# Nearest restaurants of a filming location read from the proximity table built by the
+# pipeline: a plain index range scan on (flr_location_id, flr_distance), no spatial search.
+PRECOMPUTED_RESTAURANTS_SQL = """
+    SELECT {columns},
+           p.flr_distance AS distance
+    FROM fc_filming_location_restaurants p
+    JOIN fc_restaurants r ON r.res_id = p.flr_restaurant_id
+    JOIN fc_locations l ON l.loc_id = r.res_location_id
+    WHERE p.flr_location_id = :filming_location_id
+      AND p.flr_distance <= :distance
+      AND (r.res_seating_interest_sidewalk = :seating_interest OR :seating_interest IS NULL)
+    ORDER BY p.flr_distance, r.res_id
+    LIMIT 10
+"""
+
+# Nearest restaurants of a filming location. The proximity table only covers the locations of
+# fc_filming_locations: any other location id is answered by the spatial search instead. The
+# NOT EXISTS test does not depend on the rows, so Postgres evaluates it once and only runs one
+# of the two branches. Both are returned in spheroid distance order, ties broken by res_id.
+FILMING_LOCATION_RESTAURANTS_SQL = """
+    SELECT * FROM (
+        ({precomputed})
+        UNION ALL
+        (SELECT * FROM ({spatial}) spatial
+         WHERE NOT EXISTS (SELECT 1 FROM fc_filming_locations fl WHERE fl.fl_location_id = :filming_location_id))
+    ) nearby
+    ORDER BY distance, res_id
+"""
+
+# The origin is a bound constant (an InitPlan for filming locations) so the
+# planner can drive an index-ordered KNN scan from it.
+FILMING_LOCATION_ORIGIN = "(SELECT loc_geography FROM fc_locations WHERE loc_id = :filming_location_id)"
+POINT_ORIGIN = "ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)::geography"
+
+# Nearest restaurants of many origins in one statement: the origins are unnested from
+# array parameters and each one drives its own index-ordered KNN scan (LATERAL).
+# Origins without any restaurant in range are kept with NULL restaurant columns, and
+# filming location ids missing from fc_locations are flagged with unknown_origin.
+BULK_NEARBY_RESTAURANTS_SQL = """
+    WITH origins AS ({origins})
+    SELECT o.origin_index,
+           o.geography IS NULL AS unknown_origin,
+           nr.*
+    FROM origins o
+    LEFT JOIN LATERAL (
+        SELECT {columns},
+               ST_Distance(o.geography, l.loc_geography) AS distance
+        FROM fc_locations l
+        JOIN fc_restaurants r ON r.res_location_id = l.loc_id
+        WHERE ST_DWithin(l.loc_geography, o.geography, :distance)
+          AND (r.res_seating_interest_sidewalk = :seating_interest OR :seating_interest IS NULL)
+        ORDER BY l.loc_geography <-> o.geography
+        LIMIT :k
+    ) nr ON TRUE
+    ORDER BY o.origin_index, nr.distance;
+"""
+
+POINT_ORIGINS = """
+        SELECT p.origin_index,
+               ST_SetSRID(ST_MakePoint(p.longitude, p.latitude), 4326)::geography AS geography
+        FROM unnest(CAST(:longitudes AS double precision[]), CAST(:latitudes AS double precision[]))
+             WITH ORDINALITY AS p(longitude, latitude, origin_index)"""
+
+FILMING_LOCATION_ORIGINS = """
+        SELECT f.origin_index,
+               l.loc_geography AS geography
+        FROM unnest(CAST(:filming_location_ids AS integer[])) WITH ORDINALITY AS f(loc_id, origin_index)
+        LEFT JOIN fc_locations l ON l.loc_id = f.loc_id"""
+
+# Limits of the bulk mode
+BULK_MAX_ORIGINS = int(os.getenv("RESTAURANTS_BULK_MAX_ORIGINS", "1000"))
+BULK_DEFAULT_K = 10
+BULK_MAX_K = int(os.getenv("RESTAURANTS_BULK_MAX_K", "50"))
+
+
+def bulk_nearby_restaurants_query(payload):
     """
-    Handle GET requests to fetch restaurants based on various filters.
+    Build the bulk nearest restaurants statement from a JSON body holding either 'points'
+    ([{"latitude": ..., "longitude": ...}, ...]) or 'filming_location_ids' ([1, 2, ...]).
+
+    Returns:
+        tuple: (statement, params, origins), origins being the request origins in input order.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("The body must be a JSON object.")
+    points = payload.get("points")
+    filming_location_ids = payload.get("filming_location_ids")
+
+    try:
+        k = int(payload.get("k", BULK_DEFAULT_K))
+        distance = min(float(payload.get("distance", 500)), ITINERARY_MAX_DISTANCE)  # Default to 500 meters
+        if points is not None and filming_location_ids is None:
+            points = [(float(point["latitude"]), float(point["longitude"])) for point in points]
+            origins = [{"latitude": latitude, "longitude": longitude} for latitude, longitude in points]
+            params = {"latitudes": [p[0] for p in points], "longitudes": [p[1] for p in points]}
+            origins_sql = POINT_ORIGINS
+        elif filming_location_ids is not None and points is None:
+            filming_location_ids = [int(loc_id) for loc_id in filming_location_ids]
+            origins = [{"filming_location_id": loc_id} for loc_id in filming_location_ids]
+            params = {"filming_location_ids": filming_location_ids}
+            origins_sql = FILMING_LOCATION_ORIGINS
+        else:
+            raise ValueError("You must provide either 'points' or 'filming_location_ids'.")
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid body: {e}.")
+
+    if not origins or len(origins) > BULK_MAX_ORIGINS:
+        raise ValueError(f"Between 1 and {BULK_MAX_ORIGINS} origins can be resolved at once.")
+    if not 1 <= k <= BULK_MAX_K:
+        raise ValueError(f"'k' must be between 1 and {BULK_MAX_K}.")
+
+    params.update({"distance": distance, "seating_interest": payload.get("seating_interest"), "k": k})
+    sql_query = text(BULK_NEARBY_RESTAURANTS_SQL.format(origins=origins_sql, columns=NEARBY_RESTAURANT_COLUMNS))
+    return sql_query, params, origins
+
+
+def unknown_origin_ids(rows, origins):
+    """
+    Return the filming location ids of the request that do not exist, in input order.
+    """
+    return [origins[row["origin_index"] - 1]["filming_location_id"] for row in rows if row["unknown_origin"]]
+
+
+def group_by_origin(rows, origins):
+    """
+    Attach the restaurant rows, ordered by origin_index (1-based), to their origins.
+    """
+    results = [{"origin": origin, "restaurants": []} for origin in origins]
+    for row in rows:
+        if row["res_id"] is not None:
+            results[row["origin_index"] - 1]["restaurants"].append(dump_restaurant_row(row))
+    return results
+
+
+def parse_nearby_restaurants_args(args):
+    """
+    Extract the origin and filters of a /restaurants request.
+
+    Returns:
+        tuple: (filming_location_id, latitude, longitude, distance, seating_interest)
     """
     # Extract query parameters
-    filming_location_id = request.args.get("nearby_filming_location", type=int)
-    seating_interest = request.args.get("seating_interest")
-    latitude = request.args.get("latitude", type=float)
-    longitude = request.args.get("longitude", type=float)
-    distance = request.args.get("distance", type=float, default=500)  # Default to 500 meters
+    filming_location_id = args.get("nearby_filming_location", type=int)
+    seating_interest = args.get("seating_interest")
+    latitude = args.get("latitude", type=float)
+    longitude = args.get("longitude", type=float)
+    distance = args.get("distance", type=float, default=500)  # Default to 500 meters
+
+    if not filming_location_id and not (latitude and longitude):
+        raise ValueError("You must provide either 'nearby_filming_location' or 'latitude' and 'longitude'.")
+    return filming_location_id, latitude, longitude, distance, seating_interest
+
 
+def nearby_restaurants_query(filming_location_id, latitude, longitude, distance, seating_interest, proximity_radius=None):
+    """
+    Build the nearby restaurants statement and its parameters from the parsed /restaurants
+    query arguments (see parse_nearby_restaurants_args).
+
+    Parameters:
+        proximity_radius (float): Radius covered by the proximity table, None to always run the spatial search.
+    """
     if filming_location_id:
-        sql_query = text("""
-            SELECT r.res_id, 
-                   r.res_name, 
-                   r.res_doing_business_as_dba, 
-                   r.res_seating_interest_sidewalk, 
-                   l_rest.loc_id AS l_loc_id, 
-                   l_rest.loc_name AS l_loc_name, 
-                   l_rest.loc_city AS l_loc_city, 
-                   l_rest.loc_country AS l_loc_country, 
-                   l_rest.loc_country_code AS l_loc_country_code, 
-                   l_rest.loc_county AS l_loc_county, 
-                   l_rest.loc_display_name AS l_loc_display_name, 
-                   l_rest.loc_geography AS l_loc_geography, 
-                   l_rest.loc_house_number AS l_loc_house_number, 
-                   l_rest.loc_iso3166_2_lvl4 AS l_loc_iso3166_2_lvl4, 
-                   l_rest.loc_latitude AS l_loc_latitude, 
-                   l_rest.loc_longitude AS l_loc_longitude, 
-                   l_rest.loc_neighborhood AS l_loc_neighborhood, 
-                   l_rest.loc_postcode AS l_loc_postcode, 
-                   l_rest.loc_road AS l_loc_road, 
-                   l_rest.loc_state AS l_loc_state, 
-                   l_rest.loc_suburb AS l_loc_suburb, 
-                   ST_Distance(l.loc_geography, l_rest.loc_geography) AS distance
-            FROM fc_restaurants r
-            JOIN fc_locations l_rest ON r.res_location_id = l_rest.loc_id
-            JOIN fc_locations l ON l.loc_id = :filming_location_id
-            WHERE (r.res_seating_interest_sidewalk = :seating_interest OR :seating_interest IS NULL)
-            ORDER BY distance ASC
-            LIMIT 10;
-        """)
-        params = {"filming_location_id": filming_location_id, "seating_interest": seating_interest}
-    elif latitude and longitude:
-        sql_query = text("""
-            SELECT r.res_id, 
-                   r.res_name, 
-                   r.res_doing_business_as_dba, 
-                   r.res_seating_interest_sidewalk, 
-                   l.loc_id AS l_loc_id, 
-                   l.loc_name AS l_loc_name, 
-                   l.loc_city AS l_loc_city, 
-                   l.loc_country AS l_loc_country, 
-                   l.loc_country_code AS l_loc_country_code, 
-                   l.loc_county AS l_loc_county, 
-                   l.loc_display_name AS l_loc_display_name, 
-                   l.loc_geography AS l_loc_geography, 
-                   l.loc_house_number AS l_loc_house_number, 
-                   l.loc_iso3166_2_lvl4 AS l_loc_iso3166_2_lvl4, 
-                   l.loc_latitude AS l_loc_latitude, 
-                   l.loc_longitude AS l_loc_longitude, 
-                   l.loc_neighborhood AS l_loc_neighborhood, 
-                   l.loc_postcode AS l_loc_postcode, 
-                   l.loc_road AS l_loc_road, 
-                   l.loc_state AS l_loc_state, 
-                   l.loc_suburb AS l_loc_suburb, 
-                   ST_Distance(ST_MakePoint(:longitude, :latitude)::geography, l.loc_geography) AS distance
-            FROM fc_restaurants r
-            JOIN fc_locations l ON r.res_location_id = l.loc_id
-            WHERE ST_DWithin(l.loc_geography, ST_MakePoint(:longitude, :latitude)::geography, :distance)
-            ORDER BY distance ASC
-LIMIT 10;
-        """)
-        params = {"latitude": latitude, "longitude": longitude, "distance": distance}
+        origin = FILMING_LOCATION_ORIGIN
+        params = {"filming_location_id": filming_location_id}
     else:
-        return jsonify({"error": "You must provide either 'nearby_filming_location' or 'latitude' and 'longitude'."}), 400
+        origin = POINT_ORIGIN
+        params = {"latitude": latitude, "longitude": longitude}
+
+    params.update({"distance": distance, "seating_interest": seating_interest})
+    spatial_sql = NEARBY_RESTAURANTS_SQL.format(origin=origin, columns=NEARBY_RESTAURANT_COLUMNS)
+    if filming_location_id and proximity_radius is not None and distance <= proximity_radius:
+        precomputed_sql = PRECOMPUTED_RESTAURANTS_SQL.format(columns=NEARBY_RESTAURANT_COLUMNS)
+        return text(FILMING_LOCATION_RESTAURANTS_SQL.format(precomputed=precomputed_sql, spatial=spatial_sql)), params
+    return text(spatial_sql), params
+
+
+@restaurants_bp.route("/restaurants", methods=["GET"])
+@cached
+def get_restaurants():
+    """
+    Handle GET requests to fetch restaurants based on various filters.
+    """
+    try:
+        filming_location_id, latitude, longitude, distance, seating_interest = parse_nearby_restaurants_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Points can be answered by the in-process engine, without a database round trip
+    if NEARBY_ENGINE == "memory" and not filming_location_id:
+        index = get_restaurant_index()
+        if index is not None:
+            return jsonify(index.nearest(latitude, longitude, distance, seating_interest))
 
     # Execute the query
+    sql_query, params = nearby_restaurants_query(
+        filming_location_id, latitude, longitude, distance, seating_interest, get_proximity_radius()
+    )
     result = db.session.execute(sql_query, params)
 
-    # Map results to Restaurant and Location models
-    restaurants = []
-    for row in result.mappings():
-        # Extract Restaurant fields
-        restaurant_data = {
-            "res_id": row["res_id"],
-            "res_name": row["res_name"],
-            "res_doing_business_as_dba": row["res_doing_business_as_dba"],
-            "res_seating_interest_sidewalk": row["res_seating_interest_sidewalk"],
-        }
-
-        # Extract Location fields
-        location_data = {
-            "loc_id": row["l_loc_id"],
-            "loc_name": row["l_loc_name"],
-            "loc_city": row["l_loc_city"],
-            "loc_country": row["l_loc_country"],
-            "loc_country_code": row["l_loc_country_code"],
-            "loc_county": row["l_loc_county"],
-            "loc_display_name": row["l_loc_display_name"],
-            "loc_geography": row["l_loc_geography"],
-            "loc_house_number": row["l_loc_house_number"],
-            "loc_iso3166_2_lvl4": row["l_loc_iso3166_2_lvl4"],
-            "loc_latitude": row["l_loc_latitude"],
-            "loc_longitude": row["l_loc_longitude"],
-            "loc_neighborhood": row["l_loc_neighborhood"],
-            "loc_postcode": row["l_loc_postcode"],
-            "loc_road": row["l_loc_road"],
-            "loc_state": row["l_loc_state"],
-            "loc_suburb": row["l_loc_suburb"],
-        }
-
-        # Add location and distance to restaurant_data
-        restaurant_data["location"] = location_data
-        restaurant_data["distance"] = row["distance"]
-
-        # Append to the restaurants list
-        restaurants.append(restaurant_data)
-
     # Serialize the results
-    return jsonify(restaurants_schema.dump(restaurants))
\ No newline at end of file
+    return jsonify([dump_restaurant_row(row) for row in result.mappings()])
+
+
+@restaurants_bp.route("/restaurants/nearest", methods=["POST"])
+def post_nearest_restaurants():
+    """
+    Handle POST requests resolving the nearest restaurants of many points or filming
+    locations with a single query. Returns the K nearest restaurants of each origin, in input order.
+    """
+    try:
+        sql_query, params, origins = bulk_nearby_restaurants_query(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = db.session.execute(sql_query, params).mappings().all()
+    unknown_ids = unknown_origin_ids(rows, origins)
+    if unknown_ids:
+        return jsonify({"error": f"Unknown filming location ids: {', '.join(map(str, unknown_ids))}."}), 400
+    return jsonify(group_by_origin(rows, origins))
@@ -0,0 +1,23 @@
+from flask import Blueprint, Response, jsonify
+from cache import get_cache_stats
+from database import get_pool_stats
+from metrics import PROMETHEUS_MIMETYPE, format_gauges, render_metrics
+
+stats_bp = Blueprint("stats", __name__)
+
+@stats_bp.route("/stats", methods=["GET"])
+def get_stats():
+    """
+    Handle GET requests to inspect the runtime counters of this API process.
+    """
+    return jsonify({"cache": get_cache_stats(), "pool": get_pool_stats()})
+
+
+@stats_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Handle GET requests from Prometheus: request and SQL histograms plus the cache and pool counters.
+    """
+    extra_lines = format_gauges("api_cache", "Response cache counters of this process.", "gauge", get_cache_stats())
+    extra_lines += format_gauges("api_db_pool", "Connection pool state and checkout counters of this process.", "gauge", get_pool_stats())
+    return Response(render_metrics(extra_lines), content_type=PROMETHEUS_MIMETYPE)
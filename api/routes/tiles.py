@@ -0,0 +1,95 @@
+import math
+import os
+from flask import Blueprint, Response, jsonify
+from sqlalchemy.sql import text
+from database import db
+from bbox import geography_envelope_bounds
+from cache import cached
+from conditional import etag
+
+tiles_bp = Blueprint("tiles", __name__)
+
+# Deepest zoom level served (tiles of a few meters are of no use for points)
+TILES_MAX_ZOOM = int(os.getenv("TILES_MAX_ZOOM", "20"))
+# Tile resolution, in units of the tile side
+TILES_EXTENT = 4096
+# Space kept around a tile, in the same units, so that symbols at its edge are not cut
+TILES_BUFFER = 256
+
+MVT_MIMETYPE = "application/vnd.mapbox-vector-tile"
+
+# One "locations" layer with the locations of a tile, each flagged as filming location
+# and/or restaurant. The && operator selects the candidates with the GiST index on
+# loc_geography; ST_AsMVTGeom projects them into tile coordinates and drops the points
+# outside the tile and its buffer.
+LOCATION_TILE_SQL = """
+    WITH tile_locations AS (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(l.loc_geography::geometry, 3857),
+                ST_TileEnvelope(:z, :x, :y),
+                :extent,
+                :buffer
+            ) AS geom,
+            l.loc_id,
+            l.loc_name,
+            l.loc_display_name,
+            EXISTS (SELECT 1 FROM fc_filming_locations fl WHERE fl.fl_location_id = l.loc_id) AS is_filming_location,
+            EXISTS (SELECT 1 FROM fc_restaurants r WHERE r.res_location_id = l.loc_id) AS is_restaurant
+        FROM fc_locations l
+        WHERE {spatial_filter}
+    )
+    SELECT ST_AsMVT(tile_locations, 'locations', :extent, 'geom')
+    FROM tile_locations
+    WHERE geom IS NOT NULL
+"""
+
+INDEXED_TILE_FILTER = "l.loc_geography && ST_MakeEnvelope(:west, :south, :east, :north, 4326)::geography"
+# Tiles of the first zoom levels are too wide for a geography envelope
+WORLD_TILE_FILTER = "l.loc_latitude BETWEEN :south AND :north AND l.loc_longitude BETWEEN :west AND :east"
+
+
+def tile_bounds(z, x, y, margin=0.0):
+    """
+    Longitude/latitude bounds of a Web Mercator (XYZ) tile.
+
+    Parameters:
+        margin (float): Extra space around the tile, as a fraction of its side.
+
+    Returns:
+        tuple: (west, south, east, north) in degrees.
+    """
+    tiles = 2 ** z
+
+    def longitude(column):
+        return max(-180.0, min(180.0, column / tiles * 360.0 - 180.0))
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return longitude(x - margin), latitude(y + 1 + margin), longitude(x + 1 + margin), latitude(y - margin)
+
+
+@tiles_bp.route("/tiles/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+@etag
+@cached
+def get_location_tile(z, x, y):
+    """
+    Handle GET requests for a Mapbox vector tile of the locations.
+    """
+    if not 0 <= z <= TILES_MAX_ZOOM:
+        return jsonify({"error": f"The zoom level must be between 0 and {TILES_MAX_ZOOM}."}), 400
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": f"The tile coordinates must be between 0 and {2 ** z - 1} at zoom level {z}."}), 400
+
+    # Candidates are searched in the tile and the buffer kept by ST_AsMVTGeom (256 / 4096 of its side)
+    bounds = tile_bounds(z, x, y, margin=TILES_BUFFER / TILES_EXTENT)
+    envelope_bounds = geography_envelope_bounds(bounds)
+    if envelope_bounds is not None:
+        spatial_filter, bounds = INDEXED_TILE_FILTER, envelope_bounds
+    else:
+        spatial_filter = WORLD_TILE_FILTER
+    params = dict(zip(("west", "south", "east", "north"), bounds), z=z, x=x, y=y, extent=TILES_EXTENT, buffer=TILES_BUFFER)
+    tile = db.session.execute(text(LOCATION_TILE_SQL.format(spatial_filter=spatial_filter)), params).scalar()
+
+    return Response(bytes(tile or b""), mimetype=MVT_MIMETYPE)
@@ -0,0 +1,150 @@
+"""
+Precomputed serializers for the list endpoints.
+
+They produce the same documents as the marshmallow schemas of schemas.py, but read the
+attributes of each object or row with a single precompiled attrgetter instead of
+dumping every field through marshmallow.
+"""
+from operator import attrgetter
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the standard json module is used without it
+    orjson = None
+
+# Fields dumped by LocationSchema
+LOCATION_FIELDS = (
+    "loc_id", "loc_source_type", "loc_status", "loc_failure_reason", "loc_address_type",
+    "loc_name", "loc_display_name", "loc_latitude", "loc_longitude", "loc_house_number",
+    "loc_road", "loc_neighborhood", "loc_suburb", "loc_county", "loc_city", "loc_state",
+    "loc_iso3166_2_lvl4", "loc_postcode", "loc_country", "loc_country_code",
+)
+
+# Fields dumped by SimplifiedLocationSchema
+SIMPLIFIED_LOCATION_FIELDS = (
+    "loc_name", "loc_display_name", "loc_house_number", "loc_road", "loc_neighborhood",
+    "loc_suburb", "loc_city", "loc_county", "loc_state", "loc_postcode", "loc_country",
+    "loc_country_code", "loc_iso3166_2_lvl4", "loc_latitude", "loc_longitude",
+)
+
+# Fields dumped by SimplifiedMovieSchema (and MovieSchema, plus genres and actors)
+MOVIE_FIELDS = (
+    "mov_imdb_id", "mov_title", "mov_year", "mov_rating", "mov_director", "mov_writer",
+    "mov_overview", "mov_nb_users_ratings",
+)
+
+# Relationships dumped by MovieSchema as lists of names
+MOVIE_RELATIONSHIPS = ("genres", "actors")
+
+# Restaurant fields dumped by RestaurantSchema
+RESTAURANT_FIELDS = ("res_id", "res_name", "res_doing_business_as_dba", "res_seating_interest_sidewalk")
+
+
+def compile_serializer(fields):
+    """
+    Build a function converting an object (ORM instance or result row) into a dict of the given fields.
+    """
+    fields = tuple(fields)
+    if len(fields) == 1:
+        field = fields[0]
+        getter = attrgetter(field)
+        return lambda obj: {field: getter(obj)}
+
+    getter = attrgetter(*fields)
+    return lambda obj: dict(zip(fields, getter(obj)))
+
+
+def compile_row_serializer(fields, prefix=""):
+    """
+    Build a function converting a result row mapping into a dict of the given fields,
+    reading each field from the column named prefix + field.
+    """
+    columns = tuple((field, prefix + field) for field in fields)
+    return lambda row: {field: row[column] for field, column in columns}
+
+
+dump_location = compile_serializer(LOCATION_FIELDS)
+dump_simplified_location = compile_serializer(SIMPLIFIED_LOCATION_FIELDS)
+dump_simplified_movie = compile_serializer(MOVIE_FIELDS)
+_dump_restaurant_row = compile_row_serializer(RESTAURANT_FIELDS)
+_dump_restaurant_location_row = compile_row_serializer(SIMPLIFIED_LOCATION_FIELDS, prefix="l_")
+
+
+def dump_movie(movie):
+    """
+    Serialize a Movie like MovieSchema, with genres and actors flattened to lists of names.
+    """
+    data = dump_simplified_movie(movie)
+    data["genres"] = [genre.gen_name for genre in movie.genres]
+    data["actors"] = [actor.act_name for actor in movie.actors]
+    return data
+
+
+def compile_movie_serializer(fields):
+    """
+    Build a serializer dumping only the given movie fields (columns and relationships),
+    always including mov_imdb_id which identifies the movie.
+    """
+    dump_columns = compile_serializer(
+        ("mov_imdb_id",) + tuple(field for field in MOVIE_FIELDS if field in fields and field != "mov_imdb_id")
+    )
+    with_genres = "genres" in fields
+    with_actors = "actors" in fields
+
+    def dump(movie):
+        data = dump_columns(movie)
+        if with_genres:
+            data["genres"] = [genre.gen_name for genre in movie.genres]
+        if with_actors:
+            data["actors"] = [actor.act_name for actor in movie.actors]
+        return data
+
+    return dump
+
+
+def dump_filming_location(filming_location):
+    """
+    Serialize a FilmingLocation like FilmingLocationSchema.
+    """
+    location = filming_location.location
+    movie = filming_location.movie
+    return {
+        "fl_location_id": filming_location.fl_location_id,
+        "fl_imdb_id": filming_location.fl_imdb_id,
+        "location": dump_simplified_location(location) if location is not None else None,
+        "movie": dump_simplified_movie(movie) if movie is not None else None,
+    }
+
+
+def dump_restaurant_row(row):
+    """
+    Serialize a nearby restaurant row (restaurant columns plus l_-prefixed location columns)
+    like RestaurantSchema.
+    """
+    data = _dump_restaurant_row(row)
+    data["location"] = _dump_restaurant_location_row(row)
+    data["distance"] = float(row["distance"]) if row["distance"] is not None else None
+    return data
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson when it is installed. Keys stay sorted like with the
+    default provider, so the documents are the same, only produced faster.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # Formatting arguments passed by DefaultJSONProvider.response() are mapped to orjson
+        # options, anything else is left to the standard json module
+        indent = kwargs.get("indent")
+        unsupported = set(kwargs) - {"indent", "separators"}
+        if orjson is None or unsupported or indent not in (None, 2):
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
@@ -0,0 +1,140 @@
+"""
+Slow-query log with EXPLAIN capture.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their bound parameters to a
+rotating file; a sample of them (SLOW_QUERY_EXPLAIN_SAMPLE_RATE) is run again under
+EXPLAIN (ANALYZE, BUFFERS) and the plan is logged too.
+
+When EXPLAIN_HEADER_ENABLED is set, a request sent with the 'X-Explain: 1' header gets the
+plan of each of its SELECT statements back in 'X-Query-Plan' response headers (JSON plans,
+one header per statement). Such requests bypass the response cache.
+"""
+import json
+import logging
+import os
+import random
+import time
+from logging.handlers import RotatingFileHandler
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+# Slow-query log configuration
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))  # A negative value disables the log
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))  # Between 0 and 1
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUP_COUNT = int(os.getenv("SLOW_QUERY_LOG_BACKUP_COUNT", "5"))
+EXPLAIN_HEADER_ENABLED = os.getenv("EXPLAIN_HEADER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+EXPLAIN_REQUEST_HEADER = "X-Explain"
+EXPLAIN_RESPONSE_HEADER = "X-Query-Plan"
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query_log")
+
+
+def _configure_slow_query_logger():
+    if slow_query_logger.handlers:
+        return
+    handler = RotatingFileHandler(
+        SLOW_QUERY_LOG_FILE, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+        backupCount=SLOW_QUERY_LOG_BACKUP_COUNT, encoding="utf-8", delay=True,
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.INFO)
+    slow_query_logger.propagate = False
+
+
+def _is_explainable(statement):
+    # Only read statements are executed again, EXPLAIN ANALYZE runs the statement for real
+    return statement.lstrip()[:6].upper() in ("SELECT", "WITH ")
+
+
+def explain(cursor, statement, parameters, json_format=False):
+    """
+    Run the statement again under EXPLAIN (ANALYZE, BUFFERS) on the connection of the cursor.
+
+    Parameters:
+        cursor: DBAPI cursor the statement was executed with.
+        statement (str): SQL statement as sent to the driver.
+        parameters: Bound parameters as sent to the driver.
+        json_format (bool): Return the plan as a JSON document instead of text.
+
+    Returns:
+        The plan (text lines joined, or the decoded JSON document), None if it could not be obtained.
+    """
+    explain_format = "JSON" if json_format else "TEXT"
+    explain_cursor = None
+    try:
+        explain_cursor = cursor.connection.cursor()
+        # A savepoint keeps a failing EXPLAIN from aborting the transaction of the request
+        explain_cursor.execute("SAVEPOINT explain_plan")
+        try:
+            explain_cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT {explain_format}) {statement}", parameters)
+            rows = explain_cursor.fetchall()
+        finally:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT explain_plan")
+    except Exception as e:
+        logger.warning("Could not explain a statement: %s", e)
+        return None
+    finally:
+        if explain_cursor is not None:
+            explain_cursor.close()
+
+    if json_format:
+        plan = rows[0][0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    return "\n".join(row[0] for row in rows)
+
+
+def explain_requested():
+    """
+    Return True if the current request asks for its query plans.
+    """
+    return EXPLAIN_HEADER_ENABLED and has_request_context() and request.headers.get(EXPLAIN_REQUEST_HEADER) == "1"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is dropped with the statement even when it fails
+    context._slow_query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._slow_query_start_time) * 1000
+    explainable = not executemany and _is_explainable(statement)
+
+    if explainable and explain_requested():
+        plan = explain(cursor, statement, parameters, json_format=True)
+        if plan is not None:
+            g.setdefault("query_plans", []).append(plan)
+
+    if SLOW_QUERY_THRESHOLD_MS < 0 or elapsed_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    route = request.endpoint if has_request_context() else None
+    message = f"duration_ms={elapsed_ms:.1f} route={route} statement={statement!r} parameters={parameters!r}"
+    if explainable and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        plan = explain(cursor, statement, parameters)
+        if plan is not None:
+            message += "\n" + plan
+    slow_query_logger.info(message)
+
+
+def _add_query_plans(response):
+    for plan in g.pop("query_plans", []):
+        response.headers.add(EXPLAIN_RESPONSE_HEADER, json.dumps(plan, separators=(",", ":")))
+    return response
+
+
+def init_app(app):
+    """
+    Open the slow-query log, time the statements of the application's engine and return the
+    plans of requests sent with 'X-Explain: 1'.
+    """
+    _configure_slow_query_logger()
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    app.after_request(_add_query_plans)
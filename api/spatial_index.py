@@ -0,0 +1,223 @@
+"""
+In-process spatial engine for the latitude/longitude path of /restaurants.
+
+Selected with NEARBY_ENGINE=memory (the default, "postgis", runs the query in the database).
+Restaurant coordinates are loaded from fc_locations into NumPy arrays sorted by the cell of a
+regular grid; a radius query only computes haversine distances for the points of the grid rows
+and columns overlapping the search circle. The arrays are rebuilt when the ingestion pipeline
+publishes a new dataset version.
+
+Distances are computed on a sphere, PostGIS uses the WGS 84 spheroid: they differ by up to
+about 0.5%, so restaurants right at the edge of the radius may differ between both engines.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from dataset_version import get_dataset_version
+from serializers import dump_restaurant_row
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed with NEARBY_ENGINE=memory
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Engine answering the latitude/longitude path of /restaurants, "postgis" or "memory"
+NEARBY_ENGINE = os.getenv("NEARBY_ENGINE", "postgis")
+# Side of a grid cell in meters (north-south)
+SPATIAL_INDEX_CELL_SIZE = float(os.getenv("SPATIAL_INDEX_CELL_SIZE", "250"))
+# Seconds to wait before loading the index again after a failed load of the same dataset version
+SPATIAL_INDEX_RETRY_INTERVAL = float(os.getenv("SPATIAL_INDEX_RETRY_INTERVAL", "60"))
+
+EARTH_RADIUS = 6371008.8  # Mean radius in meters
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+# Grid coordinates are offset to be positive and packed into a single int64 sort key
+_CELL_OFFSET = 1 << 21
+
+RESTAURANT_POINTS_SQL = """
+    SELECT r.res_id,
+           r.res_name,
+           r.res_doing_business_as_dba,
+           r.res_seating_interest_sidewalk,
+           l.loc_name AS l_loc_name,
+           l.loc_city AS l_loc_city,
+           l.loc_country AS l_loc_country,
+           l.loc_country_code AS l_loc_country_code,
+           l.loc_county AS l_loc_county,
+           l.loc_display_name AS l_loc_display_name,
+           l.loc_house_number AS l_loc_house_number,
+           l.loc_iso3166_2_lvl4 AS l_loc_iso3166_2_lvl4,
+           l.loc_latitude AS l_loc_latitude,
+           l.loc_longitude AS l_loc_longitude,
+           l.loc_neighborhood AS l_loc_neighborhood,
+           l.loc_postcode AS l_loc_postcode,
+           l.loc_road AS l_loc_road,
+           l.loc_state AS l_loc_state,
+           l.loc_suburb AS l_loc_suburb,
+           NULL AS distance
+    FROM fc_restaurants r
+    JOIN fc_locations l ON l.loc_id = r.res_location_id
+    WHERE l.loc_latitude IS NOT NULL
+      AND l.loc_longitude IS NOT NULL
+    ORDER BY r.res_id;
+"""
+
+
+class RestaurantIndex:
+    """
+    Restaurants sorted by grid cell, with their coordinates in NumPy arrays.
+
+    Parameters:
+        latitudes, longitudes: Coordinates of the restaurants in degrees.
+        seating_interests: Seating interest of each restaurant.
+        documents (list): Serialized restaurant of each point (see dump_restaurant_row), without distance.
+        cell_size (float): Side of a grid cell in meters.
+    """
+
+    def __init__(self, latitudes, longitudes, seating_interests, documents, cell_size=SPATIAL_INDEX_CELL_SIZE):
+        if np is None:
+            raise RuntimeError("NEARBY_ENGINE=memory requires the 'numpy' package to be installed.")
+        self.cell_degrees = max(cell_size, 50.0) / METERS_PER_DEGREE
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        keys = self._cell_keys(self._cells(latitudes), self._cells(longitudes))
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.latitudes = np.radians(latitudes[order])
+        self.longitudes = np.radians(longitudes[order])
+        self.seating_interests = np.asarray(seating_interests, dtype=object)[order]
+        self.documents = [documents[i] for i in order]
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _cells(self, degrees):
+        return np.floor(np.asarray(degrees) / self.cell_degrees).astype(np.int64)
+
+    @staticmethod
+    def _cell_keys(rows, columns):
+        return ((rows + _CELL_OFFSET) << 22) + (columns + _CELL_OFFSET)
+
+    def _candidates(self, latitude, longitude, radius):
+        """
+        Indices of the points in the grid cells overlapping the bounding box of the search circle.
+        Each grid row of the box is one contiguous slice of the sorted arrays.
+        """
+        radius_degrees = radius / METERS_PER_DEGREE
+        max_latitude = min(abs(latitude) + radius_degrees, 89.9)
+        longitude_degrees = radius_degrees / math.cos(math.radians(max_latitude))
+
+        rows = np.arange(self._cells(latitude - radius_degrees), self._cells(latitude + radius_degrees) + 1)
+        first_column = self._cells(max(longitude - longitude_degrees, -180.0))
+        last_column = self._cells(min(longitude + longitude_degrees, 180.0))
+        starts = np.searchsorted(self.keys, self._cell_keys(rows, first_column), side="left")
+        ends = np.searchsorted(self.keys, self._cell_keys(rows, last_column), side="right")
+
+        slices = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def nearest(self, latitude, longitude, radius, seating_interest=None, limit=10):
+        """
+        Return the serialized restaurants within radius meters of the point, nearest first.
+        """
+        candidates = self._candidates(latitude, longitude, radius)
+        if seating_interest is not None and len(candidates):
+            candidates = candidates[self.seating_interests[candidates] == seating_interest]
+        if not len(candidates):
+            return []
+
+        # Vectorized haversine distance
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        delta_latitude = self.latitudes[candidates] - latitude
+        delta_longitude = self.longitudes[candidates] - longitude
+        a = (np.sin(delta_latitude / 2) ** 2
+             + math.cos(latitude) * np.cos(self.latitudes[candidates]) * np.sin(delta_longitude / 2) ** 2)
+        distances = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        within = distances <= radius
+        candidates, distances = candidates[within], distances[within]
+        if len(candidates) > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.lexsort((candidates, distances))
+
+        return [dict(self.documents[candidates[i]], distance=float(distances[i])) for i in order]
+
+
+def load_restaurant_index():
+    """
+    Build a RestaurantIndex from the restaurants stored in the database.
+    """
+    with db.engine.connect() as connection:
+        rows = connection.execute(text(RESTAURANT_POINTS_SQL)).mappings().all()
+    return RestaurantIndex(
+        [row["l_loc_latitude"] for row in rows],
+        [row["l_loc_longitude"] for row in rows],
+        [row["res_seating_interest_sidewalk"] for row in rows],
+        [dump_restaurant_row(row) for row in rows],
+    )
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "failed_at": None, "failed_version": None}
+
+
+def _load_failed_recently(version):
+    # A failed load is not attempted again before the retry interval, unless the version changed
+    return (
+        _state["failed_at"] is not None
+        and _state["failed_version"] == version
+        and time.monotonic() - _state["failed_at"] < SPATIAL_INDEX_RETRY_INTERVAL
+    )
+
+
+def get_restaurant_index():
+    """
+    Return the index of the current dataset version, rebuilding it when the pipeline has
+    published a new version. Returns None if it has never been loaded successfully.
+
+    After a failed load, the previous index (or None) is returned without trying again for
+    SPATIAL_INDEX_RETRY_INTERVAL seconds, or until the pipeline publishes another version.
+    """
+    version = get_dataset_version()
+    index = _state["index"]
+    if index is not None and (version is None or version == _state["version"]):
+        return index
+    if _load_failed_recently(version):
+        return index
+
+    with _lock:
+        # Another request may have rebuilt it, or failed to, while this one was waiting
+        if _load_failed_recently(version):
+            return _state["index"]
+        if _state["index"] is None or (version is not None and version != _state["version"]):
+            try:
+                _state["index"] = load_restaurant_index()
+                _state["version"] = version
+                _state["failed_at"] = None
+                logger.info("Loaded %d restaurants in the spatial index (dataset version %s).",
+                            len(_state["index"]), version)
+            except SQLAlchemyError as e:
+                _state["failed_at"] = time.monotonic()
+                _state["failed_version"] = version
+                logger.warning("Could not load the spatial index: %s", e)
+        return _state["index"]
+
+
+def init_app(app):
+    """
+    Load the index at startup when the in-memory engine is selected.
+    """
+    if NEARBY_ENGINE == "memory":
+        if np is None:
+            raise RuntimeError("NEARBY_ENGINE=memory requires the 'numpy' package to be installed.")
+        with app.app_context():
+            get_restaurant_index()
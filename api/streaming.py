@@ -0,0 +1,50 @@
+import os
+from flask import Response, current_app, request, stream_with_context
+from pagination import apply_keyset, get_page_args
+
+STREAM_MIMETYPE = "application/x-ndjson"
+
+# Number of rows fetched from the server-side cursor at a time
+STREAM_BATCH_SIZE = int(os.getenv("API_STREAM_BATCH_SIZE", "500"))
+
+
+def wants_stream():
+    """
+    Check whether the client asked for a streamed NDJSON response,
+    either with '?stream=1' or with an 'Accept: application/x-ndjson' header.
+    """
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+    return request.accept_mimetypes.best_match(["application/json", STREAM_MIMETYPE]) == STREAM_MIMETYPE
+
+
+def stream_ndjson(items, dump=None, encoded=False):
+    """
+    Build a response that serializes and sends items one JSON document per line,
+    as they are produced, instead of encoding the full list in memory.
+
+    Parameters:
+        items (iterable): The objects to stream, typically a lazy query.
+        dump (callable): Converts one item to a JSON-serializable object.
+        encoded (bool): Items are already JSON text and are sent as they are.
+    """
+    def generate():
+        for item in items:
+            if encoded:
+                yield item + "\n"
+            else:
+                yield current_app.json.dumps(dump(item) if dump else item) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPE)
+
+
+def stream_query(query, sort_columns, dump):
+    """
+    Stream the rows of a query in sort key order, resuming after the request cursor.
+    Rows are pulled in batches from a server-side cursor with yield_per.
+    """
+    limit, cursor_values = get_page_args(streaming=True)
+    query = apply_keyset(query, sort_columns, cursor_values)
+    if limit is not None:
+        query = query.limit(limit)
+    return stream_ndjson(query.yield_per(STREAM_BATCH_SIZE), dump)
@@ -0,0 +1,132 @@
+"""
+Walking-tour ordering of the filming locations of an itinerary (order=route).
+
+The walking distances between locations are computed at once as a haversine distance matrix.
+A nearest-neighbour tour is then improved with 2-opt moves (reversing a segment of the tour when
+it shortens it) until no move helps or the time budget is spent, so the response time stays
+bounded for movies with hundreds of filming locations. The tour is an open path: it starts at
+one end of the city and does not return to its first location.
+"""
+import os
+import time
+from spatial_index import EARTH_RADIUS
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed with order=route
+    np = None
+
+# Time spent improving the tours of one request, in milliseconds
+ITINERARY_ROUTE_TIME_BUDGET_MS = float(os.getenv("ITINERARY_ROUTE_TIME_BUDGET_MS", "50"))
+
+
+def distance_matrix(latitudes, longitudes):
+    """
+    Haversine distance in meters between every pair of points.
+    """
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    delta_latitude = latitudes[:, None] - latitudes[None, :]
+    delta_longitude = longitudes[:, None] - longitudes[None, :]
+    a = (np.sin(delta_latitude / 2) ** 2
+         + np.cos(latitudes)[:, None] * np.cos(latitudes)[None, :] * np.sin(delta_longitude / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def nearest_neighbour_tour(distances):
+    """
+    Visit the nearest unvisited point from each point, starting from the point farthest from the others.
+    """
+    count = len(distances)
+    current = int(np.argmax(distances.sum(axis=1)))
+    unvisited = np.ones(count, dtype=bool)
+    unvisited[current] = False
+    tour = [current]
+    for _ in range(count - 1):
+        candidates = np.where(unvisited, distances[current], np.inf)
+        current = int(np.argmin(candidates))
+        unvisited[current] = False
+        tour.append(current)
+    return np.array(tour)
+
+
+def two_opt(tour, distances, deadline):
+    """
+    Improve an open tour with 2-opt moves until none shortens it or time.perf_counter() passes deadline.
+    For each segment start, the gains of reversing every possible segment are computed at once.
+
+    Returns:
+        tuple: (tour, complete), complete being False when the deadline stopped the search.
+    """
+    count = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(count - 1):
+            if time.perf_counter() > deadline:
+                return tour, False
+            # Reversing tour[i:j + 1] replaces the edges (a, b) and (c, e) by (a, c) and (b, e)
+            edges = distances[tour[:-1], tour[1:]]
+            b, c = tour[i], tour[i + 1:]
+            removed = np.append(edges[i + 1:], 0.0)
+            added = np.append(distances[b, tour[i + 2:]], 0.0)
+            if i > 0:
+                a = tour[i - 1]
+                removed = removed + edges[i - 1]
+                added = added + distances[a, c]
+            gains = removed - added
+            best = int(np.argmax(gains))
+            if gains[best] > 1e-6:
+                j = i + 1 + best
+                tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                improved = True
+    return tour, True
+
+
+def walking_tour(latitudes, longitudes, deadline):
+    """
+    Order points into a short walking tour.
+
+    Parameters:
+        latitudes, longitudes: Coordinates of the points in degrees.
+        deadline (float): time.perf_counter() value after which the 2-opt improvement stops.
+
+    Returns:
+        tuple: (order, distance) with the indices of the points in tour order and the tour length in meters.
+    """
+    if np is None:
+        raise RuntimeError("order=route requires the 'numpy' package to be installed.")
+    if len(latitudes) < 2:
+        return list(range(len(latitudes))), 0.0
+
+    distances = distance_matrix(latitudes, longitudes)
+    tour = nearest_neighbour_tour(distances)
+    if len(tour) > 3:
+        tour, _ = two_opt(tour, distances, deadline)
+    return tour.tolist(), float(distances[tour[:-1], tour[1:]].sum())
+
+
+def order_itinerary_route(itinerary, deadline):
+    """
+    Reorder the filming locations of an itinerary document into a walking tour, and add its
+    length in meters as route_distance. Locations without coordinates are placed last.
+    """
+    filming_locations = itinerary["filming_locations"]
+    located = [fl for fl in filming_locations if fl["latitude"] is not None and fl["longitude"] is not None]
+    order, distance = walking_tour(
+        [fl["latitude"] for fl in located], [fl["longitude"] for fl in located], deadline
+    )
+    itinerary["filming_locations"] = [located[i] for i in order] + [
+        fl for fl in filming_locations if fl["latitude"] is None or fl["longitude"] is None
+    ]
+    itinerary["route_distance"] = round(distance, 1)
+    return itinerary
+
+
+def order_itineraries_route(itineraries, time_budget_ms=ITINERARY_ROUTE_TIME_BUDGET_MS):
+    """
+    Yield each itinerary ordered into a walking tour, the time budget being shared by all of them.
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    for itinerary in itineraries:
+        yield order_itinerary_route(itinerary, deadline)
@@ -0,0 +1,292 @@
+"""
+End-to-end load benchmark of the /api/v1 endpoints.
+
+Drives a running API (backed by a loaded Postgres/PostGIS database) with a weighted mix of
+requests on every endpoint, from concurrent keep-alive connections, and reports the throughput
+and the p50/p95/p99 latency of each route as JSON. Request parameters are sampled from the
+data served by the API itself (movies, filming locations, genres, years), so the mix follows
+the dataset.
+
+Run it, then compare two runs (e.g. before and after a commit):
+
+    python benchmarks/load_benchmark.py --base-url http://localhost:5000 --concurrency 16 \\
+        --duration 60 --output results-new.json
+    python benchmarks/load_benchmark.py --compare results-old.json results-new.json
+
+Only the Python standard library is needed.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+API_PREFIX = "/api/v1"
+
+
+class Client:
+    """
+    Keep-alive HTTP connection to the API, reopened after a failure. One per worker thread.
+    """
+
+    def __init__(self, base_url, timeout):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        """
+        Send a request and read the whole response.
+
+        Returns:
+            tuple: (status, body bytes)
+        """
+        if self.connection is None:
+            self.connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        headers = {"Accept": "application/json"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+
+    def get_json(self, path, **params):
+        status, body = self.request("GET", f"{API_PREFIX}{path}?{urlencode(params)}")
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(body)
+
+
+def harvest_seeds(client, sample_size):
+    """
+    Collect the values the request mix draws its parameters from.
+    """
+    filming_locations = client.get_json("/filming-locations", limit=sample_size)
+    facets = client.get_json("/movies/facets")
+    movies = [fl["movie"] for fl in filming_locations if fl.get("movie")]
+    locations = [fl["location"] for fl in filming_locations if fl.get("location")]
+
+    seeds = {
+        "imdb_ids": sorted({movie["mov_imdb_id"] for movie in movies}),
+        "title_words": sorted({
+            word for movie in movies for word in (movie.get("mov_title") or "").split() if len(word) > 3
+        }),
+        "filming_location_ids": sorted({fl["fl_location_id"] for fl in filming_locations}),
+        "points": [
+            (float(location["loc_latitude"]), float(location["loc_longitude"]))
+            for location in locations
+            if location.get("loc_latitude") is not None and location.get("loc_longitude") is not None
+        ],
+        "cities": sorted({location["loc_city"] for location in locations if location.get("loc_city")}),
+        "suburbs": sorted({location["loc_suburb"] for location in locations if location.get("loc_suburb")}),
+        "genres": sorted(facets.get("genres", {})),
+        "years": sorted(facets.get("years", {})),
+    }
+    missing = [name for name, values in seeds.items() if not values]
+    if missing:
+        raise SystemExit(f"Not enough data to build the request mix (no {', '.join(missing)}). Is the database loaded?")
+    return seeds
+
+
+def jitter(rng, point, meters=150):
+    """
+    Move a point randomly by up to a few hundred meters, so that point queries are not all cache hits.
+    """
+    latitude, longitude = point
+    return round(latitude + rng.uniform(-1, 1) * meters / 111_000, 6), round(longitude + rng.uniform(-1, 1) * meters / 84_000, 6)
+
+
+def get(path, **params):
+    return "GET", f"{API_PREFIX}{path}?{urlencode(params)}", None
+
+
+def post(path, body):
+    return "POST", f"{API_PREFIX}{path}", body
+
+
+# Request mix: (route, weight, builder(rng, seeds) -> (method, path, body))
+SCENARIOS = [
+    ("GET /movies", 14, lambda rng, s: get("/movies", name=rng.choice(s["title_words"]), limit=rng.choice([20, 100]))),
+    ("GET /movies?genre&year", 6, lambda rng, s: get("/movies", genre=rng.choice(s["genres"]), year=rng.choice(s["years"]))),
+    ("GET /movies?fields", 4, lambda rng, s: get("/movies", genre=rng.choice(s["genres"]), fields="mov_title,mov_year")),
+    ("GET /movies/facets", 4, lambda rng, s: get("/movies/facets", **({"genre": rng.choice(s["genres"])} if rng.random() < 0.5 else {}))),
+    ("GET /locations", 8, lambda rng, s: get("/locations", **rng.choice([{"city": rng.choice(s["cities"])}, {"suburb": rng.choice(s["suburbs"])}]))),
+    ("GET /filming-locations", 10, lambda rng, s: get("/filming-locations", imdb_id=rng.choice(s["imdb_ids"]))),
+    ("GET /filming-locations?genre", 4, lambda rng, s: get("/filming-locations", genre=rng.choice(s["genres"]), limit=50)),
+    ("GET /restaurants?nearby_filming_location", 16, lambda rng, s: get(
+        "/restaurants", nearby_filming_location=rng.choice(s["filming_location_ids"]), distance=rng.choice([200, 500, 1000]))),
+    ("GET /restaurants?latitude&longitude", 12, lambda rng, s: get(
+        "/restaurants", **dict(zip(("latitude", "longitude"), jitter(rng, rng.choice(s["points"])))), distance=rng.choice([200, 500]))),
+    ("POST /restaurants/nearest", 3, lambda rng, s: post("/restaurants/nearest", {
+        "points": [dict(zip(("latitude", "longitude"), jitter(rng, point))) for point in rng.choices(s["points"], k=50)], "k": 5})),
+    ("GET /itineraries", 12, lambda rng, s: get(
+        "/itineraries", imdb_ids=",".join(rng.sample(s["imdb_ids"], min(len(s["imdb_ids"]), rng.randint(1, 5)))),
+        distance=rng.choice([300, 400, 800]))),
+    ("POST /batch", 3, lambda rng, s: post("/batch", {"requests": [
+        {"path": f"{API_PREFIX}/filming-locations", "params": {"imdb_id": imdb_id}} for imdb_id in rng.sample(s["imdb_ids"], min(len(s["imdb_ids"]), 5))
+    ]})),
+    ("GET /metadata", 1, lambda rng, s: get("/metadata")),
+]
+
+
+def summarize(latencies, errors, seconds):
+    """
+    Throughput and latency percentiles (in milliseconds) of one route.
+    """
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 2),
+    }
+    if latencies:
+        milliseconds = sorted(latency * 1000 for latency in latencies)
+        cut_points = statistics.quantiles(milliseconds, n=100, method="inclusive") if len(milliseconds) > 1 else milliseconds * 99
+        summary.update({
+            "mean_ms": round(statistics.fmean(milliseconds), 3),
+            "p50_ms": round(cut_points[49], 3),
+            "p95_ms": round(cut_points[94], 3),
+            "p99_ms": round(cut_points[98], 3),
+            "max_ms": round(milliseconds[-1], 3),
+        })
+    return summary
+
+
+def run(args):
+    seeds = harvest_seeds(Client(args.base_url, args.timeout), args.sample_size)
+    names = [name for name, _, _ in SCENARIOS]
+    weights = [weight for _, weight, _ in SCENARIOS]
+    builders = dict((name, builder) for name, _, builder in SCENARIOS)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    def worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        client = Client(args.base_url, args.timeout)
+        while True:
+            name = rng.choices(names, weights)[0]
+            method, path, body = builders[name](rng, seeds)
+            request_start = time.perf_counter()
+            if request_start >= stop_at:
+                return
+            try:
+                status, _ = client.request(method, path, body)
+                ok = status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+            elapsed = time.perf_counter() - request_start
+            if request_start < measure_from:
+                continue  # Warm-up: caches, connection pools, spatial index
+            with lock:
+                if ok:
+                    latencies[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seconds = args.duration
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    return {
+        "meta": {
+            "base_url": args.base_url,
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "seed": args.seed,
+        },
+        "total": summarize(all_latencies, sum(errors.values()), seconds),
+        "routes": {name: summarize(latencies[name], errors[name], seconds) for name in names if latencies[name] or errors[name]},
+    }
+
+
+def git_commit():
+    """
+    Commit of the checkout the benchmark is run from, to label the results.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_file, new_file):
+    """
+    Relative change (in percent) of the throughput and latency percentiles of each route between two runs.
+    """
+    with open(base_file, encoding="utf-8") as file:
+        base = json.load(file)
+    with open(new_file, encoding="utf-8") as file:
+        new = json.load(file)
+
+    def change(before, after):
+        if not before or after is None:
+            return None
+        return round((after - before) / before * 100, 1)
+
+    routes = {"total": (base["total"], new["total"])}
+    routes.update({name: (base["routes"][name], new["routes"][name]) for name in base["routes"] if name in new["routes"]})
+    return {
+        "base": base["meta"].get("commit"),
+        "new": new["meta"].get("commit"),
+        "change_percent": {
+            name: {metric: change(before.get(metric), after.get(metric)) for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")}
+            for name, (before, after) in routes.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5000", help="URL of the running API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent connections")
+    parser.add_argument("--duration", type=float, default=30, help="Measured duration in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured warm-up duration in seconds")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--sample-size", type=int, default=500, help="Number of filming locations sampled for parameters")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the request mix")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    results = compare(*args.compare) if args.compare else run(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
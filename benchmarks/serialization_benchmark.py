@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the /movies serialization: marshmallow MovieSchema + default JSON
+provider (previous path) against the precomputed serializers + FastJSONProvider.
+
+No database is needed, the movies are built in memory:
+
+    python benchmarks/serialization_benchmark.py --movies 25000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from models import Movie, Genre, Actor
+from schemas import MovieSchema
+from serializers import FastJSONProvider, dump_movie
+
+
+def build_movies(count, seed=42):
+    """
+    Build transient Movie objects with genres and actors similar to the IMDb dataset.
+    """
+    rng = random.Random(seed)
+    genres = [Genre(gen_id=i, gen_name=f"Genre {i}") for i in range(20)]
+    actors = [Actor(act_id=i, act_name=f"Actor {i}") for i in range(count)]
+    movies = []
+    for i in range(count):
+        movies.append(Movie(
+            mov_imdb_id=f"tt{i:07d}",
+            mov_title=f"Movie title {i}",
+            mov_year=rng.randint(1920, 2023),
+            mov_rating=round(rng.uniform(1, 10), 1),
+            mov_director=f"Director {rng.randint(0, count // 4)}",
+            mov_writer=f"Writer {rng.randint(0, count // 4)}",
+            mov_overview="An overview of the movie plot. " * 5,
+            mov_nb_users_ratings=str(rng.randint(10, 2000000)),
+            genres=rng.sample(genres, 3),
+            actors=rng.sample(actors, 4),
+        ))
+    return movies
+
+
+def measure(function, repeat):
+    """
+    Return the best wall time of function over repeat runs, and its last result.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=25000, help="Number of movies to serialize")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+    movies_schema = MovieSchema(many=True)
+    movies = build_movies(args.movies)
+
+    with app.app_context():
+        marshmallow_time, marshmallow_body = measure(
+            lambda: default_provider.dumps(movies_schema.dump(movies), separators=(",", ":")), args.repeat
+        )
+        fast_time, fast_body = measure(
+            lambda: fast_provider.dumps([dump_movie(movie) for movie in movies], separators=(",", ":")), args.repeat
+        )
+
+    if json.loads(marshmallow_body) != json.loads(fast_body):
+        raise SystemExit("The serializers produced different documents.")
+
+    print(json.dumps({
+        "movies": args.movies,
+        "marshmallow_seconds": round(marshmallow_time, 4),
+        "fast_seconds": round(fast_time, 4),
+        "speedup": round(marshmallow_time / fast_time, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
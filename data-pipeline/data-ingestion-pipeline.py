@@ -24,6 +24,7 @@ import time
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import psycopg2
+from post_load import bump_dataset_version, refresh_location_clusters, refresh_movie_facets, refresh_restaurant_proximity
 
 # In[5]:
 import logging
@@ -1136,5 +1137,24 @@ def update_geography(engine):
 
 update_geography(engine)
 
+
+# In[34]:
+# Precompute the restaurants around each filming location, up to the largest distance served from the table
+PROXIMITY_RADIUS = float(os.getenv("PROXIMITY_RADIUS", "2000"))  # In meters
+refresh_restaurant_proximity(engine, PROXIMITY_RADIUS)
+
+# Precompute the movie counts of /api/v1/movies/facets
+refresh_movie_facets(engine)
+
+# Precompute the map clusters of /api/v1/clusters for the low zoom levels
+CLUSTER_PRECOMPUTED_MAX_ZOOM = int(os.getenv("CLUSTER_PRECOMPUTED_MAX_ZOOM", "12"))
+CLUSTER_GRID_SIZE = int(os.getenv("CLUSTER_GRID_SIZE", "8"))  # Cells along each side of a map tile
+refresh_location_clusters(engine, CLUSTER_PRECOMPUTED_MAX_ZOOM, CLUSTER_GRID_SIZE)
+
+
+# In[35]:
+# Publish the new dataset version last, so that the API only drops its cache once the load is complete
+bump_dataset_version(engine)
+
 logger.info("Data loaded successfully into the database.")
 logger.info("Data ingestion pipeline completed successfully!")
\ No newline at end of file
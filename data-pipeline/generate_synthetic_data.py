@@ -0,0 +1,369 @@
+"""
+Synthetic data generator for scale testing.
+
+Generates locations, restaurants, movies, genres, actors, filming locations and the link tables
+at a chosen scale factor (1 is about the size of the real dataset), and bulk-loads them with
+COPY. Then it runs the same post-load steps as the ingestion pipeline (proximity table, movie
+facets, dataset version).
+
+The data is shaped like the real dataset:
+- locations are drawn around New York City neighborhoods, denser in Manhattan;
+- a few genres, actors, directors and filming locations account for most of the links (Zipf).
+
+Usage (database settings are read from the same DB_* variables as the pipeline):
+
+    python data-pipeline/generate_synthetic_data.py --scale 100 --truncate
+"""
+import argparse
+import io
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from post_load import bump_dataset_version, refresh_location_clusters, refresh_movie_facets, refresh_restaurant_proximity
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Number of rows of each kind at scale 1
+BASE_COUNTS = {
+    "filming_points": 600,
+    "restaurants": 1000,
+    "movies": 500,
+    "actors": 2500,
+    "filming_locations": 1200,
+}
+
+GENRES = [
+    "Drama", "Comedy", "Thriller", "Action", "Romance", "Crime", "Adventure", "Horror", "Mystery",
+    "Fantasy", "Sci-Fi", "Family", "Biography", "Animation", "History", "Music", "War", "Sport",
+    "Musical", "Documentary", "Western", "Film-Noir", "Short", "News",
+]
+
+# Neighborhood clusters: (borough, county, center latitude, center longitude, spread in degrees, weight)
+NYC_CLUSTERS = [
+    ("Manhattan", "New York County", 40.7549, -73.9840, 0.012, 0.22),
+    ("Manhattan", "New York County", 40.7128, -74.0060, 0.008, 0.12),
+    ("Manhattan", "New York County", 40.7794, -73.9632, 0.015, 0.12),
+    ("Manhattan", "New York County", 40.8116, -73.9465, 0.010, 0.06),
+    ("Brooklyn", "Kings County", 40.6928, -73.9903, 0.012, 0.10),
+    ("Brooklyn", "Kings County", 40.7081, -73.9571, 0.010, 0.07),
+    ("Brooklyn", "Kings County", 40.6501, -73.9496, 0.025, 0.06),
+    ("Queens", "Queens County", 40.7447, -73.9485, 0.012, 0.07),
+    ("Queens", "Queens County", 40.7675, -73.8330, 0.015, 0.04),
+    ("The Bronx", "Bronx County", 40.8448, -73.8648, 0.030, 0.04),
+    ("Staten Island", "Richmond County", 40.5795, -74.1502, 0.030, 0.02),
+]
+NYC_BOUNDS = ((40.4961, 40.9155), (-74.2557, -73.7004))
+BACKGROUND_WEIGHT = 0.08  # Share of the points drawn uniformly over the whole city
+
+SEATING_INTERESTS = ["sidewalk", "both", "roadway", "openstreets"]
+SEATING_INTEREST_WEIGHTS = [0.55, 0.25, 0.15, 0.05]
+
+STREET_NAMES = ["Broadway", "Avenue", "Street", "Place", "Boulevard", "Lane", "Road", "Drive"]
+TITLE_WORDS = [
+    "Night", "City", "Love", "Last", "Dark", "Street", "Story", "Money", "King", "Dream", "River",
+    "Bridge", "Heart", "Fire", "Secret", "Empire", "Manhattan", "Brooklyn", "Summer", "Winter",
+    "Ghost", "Game", "Road", "Sky", "Shadow", "Blue", "Gold", "Lost", "Wild", "Glass",
+]
+FIRST_NAMES = ["James", "Mary", "John", "Anna", "Robert", "Julia", "Michael", "Laura", "David", "Emma",
+               "Daniel", "Sofia", "Paul", "Grace", "Mark", "Alice", "Peter", "Nora", "Sam", "Ruth"]
+LAST_NAMES = ["Smith", "Johnson", "Brown", "Garcia", "Miller", "Davis", "Lopez", "Wilson", "Moore", "Taylor",
+              "Clark", "Lewis", "Walker", "Young", "Allen", "King", "Wright", "Scott", "Green", "Baker"]
+
+
+def zipf_weights(count, exponent=1.1):
+    """
+    Probabilities decreasing with the rank (1 / rank^exponent), summing to 1.
+    """
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def people_names(rng, ids):
+    first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), len(ids))]
+    last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), len(ids))]
+    return [f"{f} {l} {i}" for f, l, i in zip(first, last, ids)]
+
+
+def random_points(rng, count):
+    """
+    Draw points around the NYC neighborhood clusters, plus a uniform background.
+
+    Returns:
+        tuple: (latitudes, longitudes, cluster index of each point, the nearest one for the background)
+    """
+    weights = np.array([cluster[5] for cluster in NYC_CLUSTERS])
+    weights = np.append(weights / weights.sum() * (1 - BACKGROUND_WEIGHT), BACKGROUND_WEIGHT)
+    clusters = rng.choice(len(weights), size=count, p=weights)
+
+    centers = np.array([(c[2], c[3], c[4]) for c in NYC_CLUSTERS])
+    latitudes = np.empty(count)
+    longitudes = np.empty(count)
+    in_cluster = clusters < len(NYC_CLUSTERS)
+    latitudes[in_cluster] = rng.normal(centers[clusters[in_cluster], 0], centers[clusters[in_cluster], 2])
+    longitudes[in_cluster] = rng.normal(centers[clusters[in_cluster], 1], centers[clusters[in_cluster], 2] * 1.3)
+    latitudes[~in_cluster] = rng.uniform(*NYC_BOUNDS[0], (~in_cluster).sum())
+    longitudes[~in_cluster] = rng.uniform(*NYC_BOUNDS[1], (~in_cluster).sum())
+    latitudes, longitudes = np.clip(latitudes, *NYC_BOUNDS[0]), np.clip(longitudes, *NYC_BOUNDS[1])
+
+    # Background points belong to the borough of the nearest cluster
+    squared_distances = (latitudes[~in_cluster, None] - centers[:, 0]) ** 2 + (longitudes[~in_cluster, None] - centers[:, 1]) ** 2
+    clusters[~in_cluster] = squared_distances.argmin(axis=1)
+    return latitudes, longitudes, clusters
+
+
+def generate_locations(rng, first_id, count, source_type):
+    latitudes, longitudes, clusters = random_points(rng, count)
+    boroughs = np.array([c[0] for c in NYC_CLUSTERS])[clusters]
+    counties = np.array([c[1] for c in NYC_CLUSTERS])[clusters]
+    house_numbers = rng.integers(1, 1500, count)
+    roads = [f"{n} {s}" for n, s in zip(rng.integers(1, 230, count), np.array(STREET_NAMES)[rng.integers(0, len(STREET_NAMES), count)])]
+    postcodes = rng.integers(10001, 11698, count).astype(str)
+    display_names = [
+        f"{h}, {r}, {b}, {c}, City of New York, New York, {p}, United States"
+        for h, r, b, c, p in zip(house_numbers, roads, boroughs, counties, postcodes)
+    ]
+    return pd.DataFrame({
+        "loc_id": np.arange(first_id, first_id + count),
+        "loc_source_type": source_type,
+        "loc_status": "success",
+        "loc_failure_reason": None,
+        "loc_address_type": "house",
+        "loc_name": None,
+        "loc_display_name": display_names,
+        "loc_latitude": latitudes.round(7),
+        "loc_longitude": longitudes.round(7),
+        "loc_geography": [f"SRID=4326;POINT({lon:.7f} {lat:.7f})" for lat, lon in zip(latitudes, longitudes)],
+        "loc_house_number": house_numbers.astype(str),
+        "loc_road": roads,
+        "loc_neighborhood": None,
+        "loc_suburb": boroughs,
+        "loc_county": counties,
+        "loc_city": "City of New York",
+        "loc_state": "New York",
+        "loc_iso3166_2_lvl4": "US-NY",
+        "loc_postcode": postcodes,
+        "loc_country": "United States",
+        "loc_country_code": "us",
+    })
+
+
+def generate_restaurants(rng, first_id, first_location_id, count):
+    names = [f"{w} {k}" for w, k in zip(np.array(TITLE_WORDS)[rng.integers(0, len(TITLE_WORDS), count)],
+                                         rng.choice(["Cafe", "Bistro", "Pizza", "Deli", "Grill", "Diner"], count))]
+    return pd.DataFrame({
+        "res_id": np.arange(first_id, first_id + count),
+        "res_name": names,
+        "res_legal_business_name": [f"{name} LLC" for name in names],
+        "res_doing_business_as_dba": names,
+        "res_seating_interest_sidewalk": rng.choice(SEATING_INTERESTS, count, p=SEATING_INTEREST_WEIGHTS),
+        "res_landmarkdistrict_terms": rng.random(count) < 0.1,
+        "res_location_id": np.arange(first_location_id, first_location_id + count),
+    })
+
+
+def movie_ids(first_index, count):
+    return np.array([f"syn{i:09d}" for i in range(first_index, first_index + count)])
+
+
+def generate_movies(rng, first_index, count, directors):
+    years = 2023 - np.minimum(rng.exponential(18, count).astype(int), 103)  # More recent movies
+    titles = [
+        " ".join(words) for words in np.array(TITLE_WORDS)[rng.integers(0, len(TITLE_WORDS), (count, 3))]
+    ]
+    return pd.DataFrame({
+        "mov_imdb_id": movie_ids(first_index, count),
+        "mov_title": [f"{title} {i}" for title, i in zip(titles, range(first_index, first_index + count))],
+        "mov_year": years,
+        "mov_director": np.array(directors)[rng.choice(len(directors), count, p=zipf_weights(len(directors)))],
+        "mov_writer": np.array(directors)[rng.integers(0, len(directors), count)],
+        "mov_overview": "A synthetic movie shot in New York City.",
+        "mov_rating": np.clip(rng.normal(6.5, 1.2, count), 1, 10).round(1),
+        "mov_nb_users_ratings": rng.lognormal(9, 2, count).clip(5, 3_000_000).astype(int).astype(str),
+    })
+
+
+def generate_movie_genres(rng, imdb_ids, genre_ids):
+    """
+    1 to 3 distinct genres per movie, popular genres being picked more often (Gumbel top-k).
+    """
+    scores = np.log(zipf_weights(len(genre_ids))) + rng.gumbel(size=(len(imdb_ids), len(genre_ids)))
+    top = np.argsort(-scores, axis=1)[:, :3]
+    genres_per_movie = rng.choice([1, 2, 3], len(imdb_ids), p=[0.3, 0.45, 0.25])
+    keep = np.arange(3) < genres_per_movie[:, None]
+    return pd.DataFrame({
+        "gm_genre_id": np.asarray(genre_ids)[top[keep]],
+        "gm_imdb_id": np.repeat(imdb_ids, genres_per_movie),
+    })
+
+
+def generate_movie_actors(rng, imdb_ids, first_actor_id, actor_count):
+    """
+    3 to 8 actors per movie, a few prolific actors appearing in many movies.
+    """
+    actors_per_movie = rng.integers(3, 9, len(imdb_ids))
+    actor_ids = first_actor_id + rng.choice(actor_count, actors_per_movie.sum(), p=zipf_weights(actor_count, 0.9))
+    links = pd.DataFrame({"am_actor_id": actor_ids, "am_imdb_id": np.repeat(imdb_ids, actors_per_movie)})
+    return links.drop_duplicates()
+
+
+def generate_filming_locations(rng, imdb_ids, count, first_location_id, location_count):
+    """
+    Filming location links, some places (landmarks) being used by many movies.
+    """
+    return pd.DataFrame({
+        "fl_location_id": first_location_id + rng.choice(location_count, count, p=zipf_weights(location_count, 0.8)),
+        "fl_imdb_id": rng.choice(imdb_ids, count),
+    }).drop_duplicates()
+
+
+def copy_dataframe(connection, table_name, df):
+    """
+    Bulk-load a DataFrame with COPY ... FROM STDIN (CSV, empty values being NULL).
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_in_chunks(connection, table_name, total, chunk_size, generate):
+    """
+    Generate and load total rows chunk by chunk, generate(offset, count) returning a DataFrame.
+    """
+    start = time.perf_counter()
+    rows = 0
+    for offset in range(0, total, chunk_size):
+        df = generate(offset, min(chunk_size, total - offset))
+        copy_dataframe(connection, table_name, df)
+        rows += len(df)
+    elapsed = time.perf_counter() - start
+    logger.info(f"{table_name}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+
+
+def next_id(connection, table_name, column):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table_name}")
+        return cursor.fetchone()[0]
+
+
+def genre_ids_by_name(connection):
+    """
+    Ids of the GENRES, inserting the ones that do not exist yet.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT gen_name, MIN(gen_id) FROM fc_genres WHERE gen_name = ANY(%s) GROUP BY gen_name", (GENRES,))
+        ids = dict(cursor.fetchall())
+        for name in GENRES:
+            if name not in ids:
+                cursor.execute("INSERT INTO fc_genres (gen_name) VALUES (%s) RETURNING gen_id", (name,))
+                ids[name] = cursor.fetchone()[0]
+    return [ids[name] for name in GENRES]
+
+
+def generate(engine, scale, seed, chunk_size, truncate):
+    rng = np.random.default_rng(seed)
+    counts = {name: max(1, round(count * scale)) for name, count in BASE_COUNTS.items()}
+    logger.info(f"Generating scale {scale}: {counts}")
+
+    connection = engine.raw_connection()
+    try:
+        if truncate:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "TRUNCATE fc_filming_location_restaurants, fc_movie_facets, fc_location_clusters, fc_filming_locations, fc_restaurants,"
+                    " fc_genres_movies, fc_actors_movies, fc_genres, fc_actors, fc_movies, fc_locations"
+                )
+
+        first_location_id = next_id(connection, "fc_locations", "loc_id")
+        first_restaurant_id = next_id(connection, "fc_restaurants", "res_id")
+        first_actor_id = next_id(connection, "fc_actors", "act_id")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM fc_movies WHERE mov_imdb_id LIKE 'syn%'")
+            first_movie_index = cursor.fetchone()[0]
+        genre_ids = genre_ids_by_name(connection)
+
+        filming_points = counts["filming_points"]
+        restaurant_location_id = first_location_id + filming_points
+        directors = people_names(rng, range(max(10, counts["movies"] // 5)))
+
+        # Filming places first, then one location per restaurant
+        load_in_chunks(connection, "fc_locations", filming_points, chunk_size,
+                       lambda offset, count: generate_locations(rng, first_location_id + offset, count, "filming"))
+        load_in_chunks(connection, "fc_locations", counts["restaurants"], chunk_size,
+                       lambda offset, count: generate_locations(rng, restaurant_location_id + offset, count, "restaurant"))
+        load_in_chunks(connection, "fc_restaurants", counts["restaurants"], chunk_size,
+                       lambda offset, count: generate_restaurants(
+                           rng, first_restaurant_id + offset, restaurant_location_id + offset, count))
+
+        load_in_chunks(connection, "fc_movies", counts["movies"], chunk_size,
+                       lambda offset, count: generate_movies(rng, first_movie_index + offset, count, directors))
+        load_in_chunks(connection, "fc_actors", counts["actors"], chunk_size,
+                       lambda offset, count: pd.DataFrame({
+                           "act_id": np.arange(first_actor_id + offset, first_actor_id + offset + count),
+                           "act_name": people_names(rng, range(first_actor_id + offset, first_actor_id + offset + count)),
+                       }))
+        load_in_chunks(connection, "fc_genres_movies", counts["movies"], chunk_size,
+                       lambda offset, count: generate_movie_genres(rng, movie_ids(first_movie_index + offset, count), genre_ids))
+        load_in_chunks(connection, "fc_actors_movies", counts["movies"], chunk_size,
+                       lambda offset, count: generate_movie_actors(
+                           rng, movie_ids(first_movie_index + offset, count), first_actor_id, counts["actors"]))
+
+        all_imdb_ids = movie_ids(first_movie_index, counts["movies"])
+        load_in_chunks(connection, "fc_filming_locations", counts["filming_locations"], chunk_size,
+                       lambda offset, count: generate_filming_locations(
+                           rng, all_imdb_ids, count, first_location_id, filming_points))
+
+        # Ids were set explicitly, move the SERIAL sequences past them
+        with connection.cursor() as cursor:
+            for table_name, column in (("fc_locations", "loc_id"), ("fc_restaurants", "res_id"), ("fc_actors", "act_id")):
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table_name}', '{column}'), (SELECT MAX({column}) FROM {table_name}))"
+                )
+        connection.commit()
+    finally:
+        connection.close()
+
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE;"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=10, help="Scale factor, 1 being about the size of the real dataset")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows generated and copied at once")
+    parser.add_argument("--truncate", action="store_true", help="Empty the tables before loading")
+    parser.add_argument("--skip-post-load", action="store_true", help="Do not rebuild the precomputed tables")
+    parser.add_argument("--database-url", help="Database URL, built from the DB_* variables if omitted")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = args.database_url or (
+        f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
+        f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    )
+    engine = create_engine(database_url)
+
+    generate(engine, args.scale, args.seed, args.chunk_size, args.truncate)
+
+    if not args.skip_post_load:
+        start = time.perf_counter()
+        refresh_restaurant_proximity(engine, float(os.getenv("PROXIMITY_RADIUS", "2000")))
+        refresh_movie_facets(engine)
+        refresh_location_clusters(
+            engine, int(os.getenv("CLUSTER_PRECOMPUTED_MAX_ZOOM", "12")), int(os.getenv("CLUSTER_GRID_SIZE", "8"))
+        )
+        logger.info(f"Post-load steps in {time.perf_counter() - start:.1f}s")
+    bump_dataset_version(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Maintenance steps run against the database once the ingestion pipeline has loaded the data.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+def bump_dataset_version(engine):
+    """
+    Increment the dataset version read by the API, which invalidates its cached responses.
+
+    Parameters:
+        engine: The SQLAlchemy database engine.
+    """
+    bump_query = """
+    INSERT INTO fc_dataset_version (dv_id, dv_version, dv_loaded_at)
+    VALUES (1, 1, now())
+    ON CONFLICT (dv_id) DO UPDATE
+    SET
+        dv_version = fc_dataset_version.dv_version + 1,
+        dv_loaded_at = now();
+    """
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(bump_query))
+
+    except SQLAlchemyError as e:
+        print(f"An error occurred while updating the dataset version: {e}")
+
+
+def refresh_restaurant_proximity(engine, radius):
+    """
+    Rebuild fc_filming_location_restaurants: every restaurant within the radius of each filming
+    location, with its distance. The API reads it instead of running a spatial search when the
+    requested distance does not exceed the radius recorded in fc_dataset_version.
+
+    Parameters:
+        engine: The SQLAlchemy database engine.
+        radius (float): Maximum distance in meters between a filming location and its restaurants.
+    """
+    refresh_queries = [
+        "DELETE FROM fc_filming_location_restaurants;",
+        """
+        INSERT INTO fc_filming_location_restaurants (flr_location_id, flr_restaurant_id, flr_distance)
+        SELECT
+            fl.loc_id,
+            r.res_id,
+            ST_Distance(fl.loc_geography, l.loc_geography)
+        FROM (
+            SELECT DISTINCT fl_location_id FROM fc_filming_locations
+        ) f
+        JOIN fc_locations fl ON fl.loc_id = f.fl_location_id
+        JOIN fc_locations l ON ST_DWithin(l.loc_geography, fl.loc_geography, :radius)
+        JOIN fc_restaurants r ON r.res_location_id = l.loc_id;
+        """,
+        """
+        INSERT INTO fc_dataset_version (dv_id, dv_proximity_radius)
+        VALUES (1, :radius)
+        ON CONFLICT (dv_id) DO UPDATE
+        SET dv_proximity_radius = :radius;
+        """,
+        "ANALYZE fc_filming_location_restaurants;",
+    ]
+    try:
+        # One transaction: the API keeps reading the previous rows until the new ones are complete
+        with engine.begin() as connection:
+            for query in refresh_queries:
+                connection.execute(text(query), {"radius": radius})
+
+    except SQLAlchemyError as e:
+        print(f"An error occurred while refreshing fc_filming_location_restaurants: {e}")
+
+
+def refresh_movie_facets(engine):
+    """
+    Rebuild fc_movie_facets, the number of movies per genre, per year and with or without
+    filming locations, read by /api/v1/movies/facets when no filter is applied.
+
+    Parameters:
+        engine: The SQLAlchemy database engine.
+    """
+    refresh_queries = [
+        "DELETE FROM fc_movie_facets;",
+        """
+        INSERT INTO fc_movie_facets (mf_facet, mf_value, mf_count)
+        SELECT 'total', '', COUNT(*) FROM fc_movies
+        UNION ALL
+        SELECT 'genre', g.gen_name, COUNT(DISTINCT gm.gm_imdb_id)
+        FROM fc_genres g
+        JOIN fc_genres_movies gm ON gm.gm_genre_id = g.gen_id
+        WHERE g.gen_name IS NOT NULL
+        GROUP BY g.gen_name
+        UNION ALL
+        SELECT 'year', m.mov_year::text, COUNT(*)
+        FROM fc_movies m
+        WHERE m.mov_year IS NOT NULL
+        GROUP BY m.mov_year
+        UNION ALL
+        SELECT 'has_filming_location', f.has_filming_location::text, COUNT(*)
+        FROM (
+            SELECT EXISTS (
+                SELECT 1 FROM fc_filming_locations fl WHERE fl.fl_imdb_id = m.mov_imdb_id
+            ) AS has_filming_location
+            FROM fc_movies m
+        ) f
+        GROUP BY f.has_filming_location;
+        """,
+    ]
+    try:
+        with engine.begin() as connection:
+            for query in refresh_queries:
+                connection.execute(text(query))
+
+    except SQLAlchemyError as e:
+        print(f"An error occurred while refreshing fc_movie_facets: {e}")
+
+
+def refresh_location_clusters(engine, max_zoom, grid_size):
+    """
+    Rebuild fc_location_clusters: for each zoom level up to max_zoom, the filming locations and
+    the restaurants grouped by cell of a grid of grid_size x grid_size cells per Web Mercator
+    tile, with their count and mean position. /api/v1/clusters reads it for these zoom levels.
+
+    Parameters:
+        engine: The SQLAlchemy database engine.
+        max_zoom (int): Deepest zoom level to precompute.
+        grid_size (int): Number of cells along each side of a tile.
+    """
+    refresh_queries = [
+        "DELETE FROM fc_location_clusters;",
+        """
+        INSERT INTO fc_location_clusters (lc_kind, lc_zoom, lc_cell_x, lc_cell_y, lc_latitude, lc_longitude, lc_count)
+        WITH points AS (
+            SELECT 'filming_location' AS kind, l.loc_latitude AS latitude, l.loc_longitude AS longitude
+            FROM fc_locations l
+            WHERE EXISTS (SELECT 1 FROM fc_filming_locations fl WHERE fl.fl_location_id = l.loc_id)
+            UNION ALL
+            SELECT 'restaurant', l.loc_latitude, l.loc_longitude
+            FROM fc_restaurants r
+            JOIN fc_locations l ON l.loc_id = r.res_location_id
+        ),
+        projected AS (
+            -- Web Mercator coordinates between 0 and 1, from the top left corner of the world
+            SELECT
+                kind,
+                latitude,
+                longitude,
+                (longitude + 180) / 360 AS mercator_x,
+                (1 - ln(tan(radians(latitude)) + 1 / cos(radians(latitude))) / pi()) / 2 AS mercator_y
+            FROM points
+            WHERE latitude BETWEEN -85.0511 AND 85.0511
+              AND longitude BETWEEN -180 AND 180
+        )
+        SELECT
+            kind,
+            zoom,
+            LEAST(floor(mercator_x * cells)::int, cells - 1) AS cell_x,
+            LEAST(floor(mercator_y * cells)::int, cells - 1) AS cell_y,
+            AVG(latitude),
+            AVG(longitude),
+            COUNT(*)
+        FROM projected
+        CROSS JOIN LATERAL (
+            SELECT zoom, (2 ^ zoom)::int * :grid_size AS cells FROM generate_series(0, :max_zoom) zoom
+        ) z
+        GROUP BY kind, zoom, cell_x, cell_y;
+        """,
+        """
+        INSERT INTO fc_dataset_version (dv_id, dv_cluster_max_zoom)
+        VALUES (1, :max_zoom)
+        ON CONFLICT (dv_id) DO UPDATE
+        SET dv_cluster_max_zoom = :max_zoom;
+        """,
+        "ANALYZE fc_location_clusters;",
+    ]
+    try:
+        # One transaction: the API keeps reading the previous clusters until the new ones are complete
+        with engine.begin() as connection:
+            for query in refresh_queries:
+                connection.execute(text(query), {"max_zoom": max_zoom, "grid_size": grid_size})
+
+    except SQLAlchemyError as e:
+        print(f"An error occurred while refreshing fc_location_clusters: {e}")
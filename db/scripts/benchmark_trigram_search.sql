@@ -0,0 +1,102 @@
+/*
+    Trigram search benchmark
+
+    Compares the substring filters of /movies, /filming-locations and /locations
+    before and after the pg_trgm GIN indexes. Run it against a database loaded
+    with the full dataset:
+
+        psql -h localhost -U root -d food-and-the-city -f db/scripts/benchmark_trigram_search.sql
+
+    Every query is explained twice:
+    1. "Before": bitmap and index scans are disabled, which reproduces the sequential
+       scans the planner had to use without the trigram indexes.
+    2. "After": default planner settings; the plans should show a Bitmap Index Scan
+       on the matching idx_*_trgm index.
+    Compare the "Execution Time" and "Buffers" lines of both runs.
+*/
+
+\timing on
+ANALYZE fc_movies;
+ANALYZE fc_genres;
+ANALYZE fc_actors;
+ANALYZE fc_locations;
+
+-- ===== Before: sequential scans =====
+SET enable_bitmapscan = off;
+SET enable_indexscan = off;
+
+-- /movies?name=godfather
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE fc_movies.mov_title ILIKE '%godfather%';
+
+-- /movies?director=spielberg
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE fc_movies.mov_director ILIKE '%spielberg%';
+
+-- /movies?genre=drama
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE EXISTS (
+    SELECT 1 FROM fc_genres_movies, fc_genres
+    WHERE fc_movies.mov_imdb_id = fc_genres_movies.gm_imdb_id
+      AND fc_genres.gen_id = fc_genres_movies.gm_genre_id
+      AND fc_genres.gen_name ILIKE '%drama%'
+);
+
+-- /movies?actor=pacino
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE EXISTS (
+    SELECT 1 FROM fc_actors_movies, fc_actors
+    WHERE fc_movies.mov_imdb_id = fc_actors_movies.am_imdb_id
+      AND fc_actors.act_id = fc_actors_movies.am_actor_id
+      AND fc_actors.act_name ILIKE '%pacino%'
+);
+
+-- /locations?city=new york&suburb=brooklyn
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_locations.loc_id FROM fc_locations
+WHERE fc_locations.loc_city ILIKE '%new york%'
+  AND fc_locations.loc_suburb ILIKE '%brooklyn%';
+
+-- ===== After: trigram indexes =====
+RESET enable_bitmapscan;
+RESET enable_indexscan;
+
+-- /movies?name=godfather
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE fc_movies.mov_title ILIKE '%godfather%';
+
+-- /movies?director=spielberg
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE fc_movies.mov_director ILIKE '%spielberg%';
+
+-- /movies?genre=drama
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE EXISTS (
+    SELECT 1 FROM fc_genres_movies, fc_genres
+    WHERE fc_movies.mov_imdb_id = fc_genres_movies.gm_imdb_id
+      AND fc_genres.gen_id = fc_genres_movies.gm_genre_id
+      AND fc_genres.gen_name ILIKE '%drama%'
+);
+
+-- /movies?actor=pacino
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_movies.mov_imdb_id FROM fc_movies
+WHERE EXISTS (
+    SELECT 1 FROM fc_actors_movies, fc_actors
+    WHERE fc_movies.mov_imdb_id = fc_actors_movies.am_imdb_id
+      AND fc_actors.act_id = fc_actors_movies.am_actor_id
+      AND fc_actors.act_name ILIKE '%pacino%'
+);
+
+-- /locations?city=new york&suburb=brooklyn
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT fc_locations.loc_id FROM fc_locations
+WHERE fc_locations.loc_city ILIKE '%new york%'
+  AND fc_locations.loc_suburb ILIKE '%brooklyn%';
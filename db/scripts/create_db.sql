@@ -1,6 +1,8 @@
 -- Recreate the schema
 -- Enable PostGIS extension
 CREATE EXTENSION IF NOT EXISTS postgis;
+-- Enable trigram matching for the substring (ILIKE '%...%') search filters
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- fc_locations Table
 CREATE TABLE fc_locations (
@@ -27,6 +29,13 @@ CREATE TABLE fc_locations (
     loc_country_code VARCHAR(10)
 );
 
+-- Spatial index used by ST_DWithin radius filters and <-> nearest-neighbour ordering
+CREATE INDEX idx_fc_locations_loc_geography ON fc_locations USING GIST (loc_geography);
+
+-- Trigram indexes used by the city and suburb filters of /locations
+CREATE INDEX idx_fc_locations_loc_city_trgm ON fc_locations USING GIN (loc_city gin_trgm_ops);
+CREATE INDEX idx_fc_locations_loc_suburb_trgm ON fc_locations USING GIN (loc_suburb gin_trgm_ops);
+
 -- fc_filming_locations Table
 CREATE TABLE fc_filming_locations (
     fl_location_id INT REFERENCES fc_locations(loc_id),
@@ -46,6 +55,34 @@ CREATE TABLE fc_restaurants (
     res_location_id INT REFERENCES fc_locations(loc_id)
 );
 
+CREATE INDEX idx_fc_restaurants_res_location_id ON fc_restaurants (res_location_id);
+
+-- fc_filming_location_restaurants Table: restaurants within the proximity radius of each
+-- filming location, rebuilt by the ingestion pipeline after each load
+CREATE TABLE fc_filming_location_restaurants (
+    flr_location_id INT REFERENCES fc_locations(loc_id),
+    flr_restaurant_id INT REFERENCES fc_restaurants(res_id),
+    flr_distance FLOAT NOT NULL,
+    PRIMARY KEY (flr_location_id, flr_restaurant_id)
+);
+
+-- Nearest restaurants of a filming location read in distance order
+CREATE INDEX idx_fc_filming_location_restaurants_location_distance
+    ON fc_filming_location_restaurants (flr_location_id, flr_distance);
+
+-- fc_location_clusters Table: grid clusters of the filming locations and restaurants for the
+-- low zoom levels of the map, rebuilt by the ingestion pipeline after each load
+CREATE TABLE fc_location_clusters (
+    lc_kind VARCHAR(20), -- 'filming_location' or 'restaurant'
+    lc_zoom INT,
+    lc_cell_x INT,
+    lc_cell_y INT,
+    lc_latitude DOUBLE PRECISION NOT NULL, -- Mean position of the points of the cell
+    lc_longitude DOUBLE PRECISION NOT NULL,
+    lc_count INT NOT NULL,
+    PRIMARY KEY (lc_zoom, lc_kind, lc_cell_x, lc_cell_y)
+);
+
 -- fc_movies Table
 CREATE TABLE fc_movies (
     mov_imdb_id VARCHAR(20) PRIMARY KEY,
@@ -58,12 +95,18 @@ CREATE TABLE fc_movies (
     mov_nb_users_ratings VARCHAR(10)
 );
 
+-- Trigram indexes used by the name and director filters
+CREATE INDEX idx_fc_movies_mov_title_trgm ON fc_movies USING GIN (mov_title gin_trgm_ops);
+CREATE INDEX idx_fc_movies_mov_director_trgm ON fc_movies USING GIN (mov_director gin_trgm_ops);
+
 -- fc_genres Table
 CREATE TABLE fc_genres (
     gen_id SERIAL PRIMARY KEY,
     gen_name VARCHAR(100)
 );
 
+CREATE INDEX idx_fc_genres_gen_name_trgm ON fc_genres USING GIN (gen_name gin_trgm_ops);
+
 -- fc_genres_movies Table
 CREATE TABLE fc_genres_movies (
     gm_genre_id INT REFERENCES fc_genres(gen_id),
@@ -77,9 +120,31 @@ CREATE TABLE fc_actors (
     act_name VARCHAR(255)
 );
 
+CREATE INDEX idx_fc_actors_act_name_trgm ON fc_actors USING GIN (act_name gin_trgm_ops);
+
 -- fc_actors_movies Table
 CREATE TABLE fc_actors_movies (
     am_actor_id INT REFERENCES fc_actors(act_id),
     am_imdb_id VARCHAR(20) REFERENCES fc_movies(mov_imdb_id),
     PRIMARY KEY (am_actor_id, am_imdb_id)
-);
\ No newline at end of file
+);
+
+-- fc_movie_facets Table: number of movies per genre, year and presence of filming locations,
+-- rebuilt by the ingestion pipeline after each load
+CREATE TABLE fc_movie_facets (
+    mf_facet VARCHAR(30), -- 'total', 'genre', 'year' or 'has_filming_location'
+    mf_value VARCHAR(255),
+    mf_count INT NOT NULL,
+    PRIMARY KEY (mf_facet, mf_value)
+);
+
+-- fc_dataset_version Table: single row bumped by the ingestion pipeline at the end of each load
+CREATE TABLE fc_dataset_version (
+    dv_id INT PRIMARY KEY DEFAULT 1 CHECK (dv_id = 1),
+    dv_version INT NOT NULL DEFAULT 0,
+    dv_loaded_at TIMESTAMP,
+    dv_proximity_radius FLOAT, -- Radius (meters) covered by fc_filming_location_restaurants, NULL until it is built
+    dv_cluster_max_zoom INT -- Deepest zoom level stored in fc_location_clusters, NULL until it is built
+);
+
+INSERT INTO fc_dataset_version (dv_id, dv_version) VALUES (1, 0);
@@ -1,4 +1,12 @@
 -- Drop all tables in order of dependency
+DROP TABLE IF EXISTS fc_dataset_version CASCADE;
+
+DROP TABLE IF EXISTS fc_filming_location_restaurants CASCADE;
+
+DROP TABLE IF EXISTS fc_movie_facets CASCADE;
+
+DROP TABLE IF EXISTS fc_location_clusters CASCADE;
+
 DROP TABLE IF EXISTS fc_filming_locations CASCADE;
 
 DROP TABLE IF EXISTS fc_restaurants CASCADE;